@@ -13,7 +13,7 @@ from sqlalchemy import select
 
 from app.config import settings
 from app.database import get_db
-from app.models import User, UserType
+from app.models import User, UserType, Manager
 from app.schemas import TokenData
 
 # Password hashing - use argon2 due to bcrypt/passlib compatibility issues
@@ -65,11 +65,19 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    result = await db.execute(select(User).filter(User.username == token_data.username))
-    user = result.scalar_one_or_none()
+    # The manager's department comes back with the user row, so manager
+    # endpoints don't need a second lookup (see get_manager_department)
+    result = await db.execute(
+        select(User, Manager.department_id)
+        .outerjoin(Manager, Manager.user_id == User.id)
+        .filter(User.username == token_data.username)
+    )
+    row = result.first()
     
-    if user is None:
+    if row is None:
         raise credentials_exception
+    user, manager_department_id = row
+    user.manager_department_id = manager_department_id
     return user
 
 
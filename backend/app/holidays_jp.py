@@ -6,9 +6,13 @@ and to get holiday information.
 """
 
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 from typing import Optional, Dict, List
 import holidays as holidays_lib
 
+# Indexed by date.weekday(); locale-independent, unlike strftime('%A')
+WEEKDAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
 
 class JapaneseCalendar:
     """Utility class for Japanese calendar operations"""
@@ -103,28 +107,30 @@ class JapaneseCalendar:
             'required_shifts': 5
         }
         
-        current_date = week_start
-        while current_date <= week_end:
-            day_info = {
-                'date': current_date,
-                'day_name': current_date.strftime('%A'),
-                'is_weekend': self.is_weekend(current_date),
-                'is_holiday': self.is_holiday(current_date),
-                'holiday_name': self.get_holiday_name(current_date),
-                'is_non_working': self.is_weekend_or_holiday(current_date)
-            }
-            
-            week_info['days'].append(day_info)
-            
-            if day_info['is_weekend']:
-                week_info['weekend_count'] += 1
-            
-            if day_info['is_holiday']:
-                week_info['holiday_count'] += 1
-                if not day_info['is_weekend']:
-                    week_info['weekday_holiday_count'] += 1
-            
-            current_date += timedelta(days=1)
+        # Build the seven days in one pass; each date is looked up in the
+        # holiday table once and weekdays follow from week_start's
+        first_weekday = week_start.weekday()
+        days = [week_start + timedelta(days=offset) for offset in range(7)]
+        holiday_names = [self.holidays_jp.get(day) for day in days]
+        weekdays = [(first_weekday + offset) % 7 for offset in range(7)]
+        
+        for day, weekday, holiday_name in zip(days, weekdays, holiday_names):
+            is_weekend = weekday >= 5  # 5 = Saturday, 6 = Sunday
+            is_holiday = holiday_name is not None
+            week_info['days'].append({
+                'date': day,
+                'day_name': WEEKDAY_NAMES[weekday],
+                'is_weekend': is_weekend,
+                'is_holiday': is_holiday,
+                'holiday_name': holiday_name,
+                'is_non_working': is_weekend or is_holiday
+            })
+        
+        week_info['weekend_count'] = weekdays.count(5) + weekdays.count(6)
+        week_info['holiday_count'] = sum(1 for day in week_info['days'] if day['is_holiday'])
+        week_info['weekday_holiday_count'] = sum(
+            1 for day in week_info['days'] if day['is_holiday'] and not day['is_weekend']
+        )
         
         # Calculate required shifts
         week_info['required_shifts'] = max(4, 5 - week_info['weekday_holiday_count'])
@@ -136,11 +142,16 @@ class JapaneseCalendar:
 jp_calendar = JapaneseCalendar()
 
 
+# Holidays never change for a given date, so the lookups are memoized; the
+# holidays library re-validates and converts the key on every `in` check
+
+@lru_cache(maxsize=4096)
 def is_japanese_holiday(target_date: date) -> bool:
     """Convenience function to check if date is Japanese holiday"""
     return jp_calendar.is_holiday(target_date)
 
 
+@lru_cache(maxsize=4096)
 def get_japanese_holiday_name(target_date: date) -> Optional[str]:
     """Convenience function to get Japanese holiday name"""
     return jp_calendar.get_holiday_name(target_date)
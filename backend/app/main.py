@@ -6,18 +6,26 @@ Complete with Employee Portal, Messaging, and Check-In/Out
 from fastapi import FastAPI, Depends, HTTPException, status, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import io
+import orjson
+import hashlib
+import logging
 import calendar
 from calendar import monthrange
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, update, and_, or_, func, Float, Integer
-from sqlalchemy.orm import selectinload, with_loader_criteria
+from sqlalchemy import select, insert, delete, update, and_, or_, tuple_, func, case, extract, literal, literal_column, null, Float
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import selectinload, joinedload, contains_eager, with_loader_criteria, raiseload
 from datetime import datetime, timedelta, date
 from typing import List, Dict, Optional
-from collections import defaultdict
+from collections import Counter, defaultdict, namedtuple
+from functools import lru_cache
+from heapq import merge
+from types import MappingProxyType
 
 from ortools.sat.python import cp_model
 
@@ -36,7 +44,9 @@ from app.auth import (
     get_current_active_user, require_admin, require_manager, require_employee
 )
 from app.schedule_generator import ShiftScheduleGenerator
-from app.holidays_jp import jp_calendar, is_japanese_holiday, get_japanese_holiday_name
+from app.holidays_jp import jp_calendar, WEEKDAY_NAMES
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Shift Scheduler V5.1 API",
@@ -242,6 +252,103 @@ async def add_employee_id_column():
         print(f"Employee ID migration error: {e}")
 
 
+async def add_performance_indexes():
+    """Migration to add composite indexes used by hot queries"""
+    from app.database import engine
+    from sqlalchemy import text
+    
+    try:
+        async with engine.begin() as conn:
+            # Paid-leave quota check in create_leave_request
+            await conn.execute(
+                text("""
+                    CREATE INDEX IF NOT EXISTS ix_leave_emp_type_status
+                    ON leave_requests (employee_id, leave_type, status)
+                """)
+            )
+            # Department scoping of comp-off requests in list_comp_off_requests
+            await conn.execute(
+                text("""
+                    CREATE INDEX IF NOT EXISTS ix_employee_dept_id
+                    ON employees (department_id, id)
+                """)
+            )
+            await conn.execute(
+                text("""
+                    CREATE INDEX IF NOT EXISTS ix_compoff_req_emp_date
+                    ON comp_off_requests (employee_id, comp_off_date)
+                """)
+            )
+            # Per-employee day/week lookups (create_schedule constraints, get_schedules)
+            await conn.execute(
+                text("""
+                    CREATE INDEX IF NOT EXISTS ix_schedule_emp_date
+                    ON schedules (employee_id, date)
+                """)
+            )
+            # Department/date-range/status filters: get_schedules, generate_schedules'
+            # existing-range check and regenerate clean-up; supersedes (department_id, date)
+            await conn.execute(
+                text("""
+                    CREATE INDEX IF NOT EXISTS ix_schedule_dept_date_status
+                    ON schedules (department_id, date, status)
+                """)
+            )
+            await conn.execute(text("DROP INDEX IF EXISTS ix_schedule_dept_date"))
+            # Same-weekday shift-time fallback for comp-off days in generate_schedules
+            await conn.execute(
+                text("""
+                    CREATE INDEX IF NOT EXISTS ix_schedule_emp_isodow
+                    ON schedules (employee_id, (EXTRACT(isodow FROM date)))
+                """)
+            )
+            # Partial indexes: only unread notifications / undeleted messages are queried
+            await conn.execute(
+                text("""
+                    CREATE INDEX IF NOT EXISTS ix_notification_user_unread
+                    ON notifications (user_id) WHERE is_read = false
+                """)
+            )
+            await conn.execute(
+                text("""
+                    CREATE INDEX IF NOT EXISTS ix_message_recipient_live
+                    ON messages (recipient_id) WHERE is_deleted_by_recipient = false
+                """)
+            )
+            await conn.execute(
+                text("""
+                    CREATE INDEX IF NOT EXISTS ix_message_sender_live
+                    ON messages (sender_id) WHERE is_deleted_by_sender = false
+                """)
+            )
+            print("✓ Performance indexes ensured")
+    except Exception as e:
+        print(f"Performance index migration error: {e}")
+
+
+async def normalize_shift_schedule_configs():
+    """Migration to give every shift's schedule_config an entry for all seven days"""
+    from app.database import engine
+    from sqlalchemy import bindparam
+    
+    try:
+        async with engine.begin() as conn:
+            result = await conn.execute(select(Shift.id, Shift.schedule_config))
+            updates = [
+                {"shift_id": shift_id, "config": normalize_schedule_config(config)}
+                for shift_id, config in result.all()
+                if normalize_schedule_config(config) != config
+            ]
+            if updates:
+                await conn.execute(
+                    update(Shift)
+                    .where(Shift.id == bindparam("shift_id"))
+                    .values(schedule_config=bindparam("config"), updated_at=Shift.updated_at),
+                    updates
+                )
+            print(f"✓ Normalized schedule_config of {len(updates)} shift(s)")
+    except Exception as e:
+        print(f"Shift schedule_config migration error: {e}")
 
 
 @app.on_event("startup")
@@ -255,6 +362,8 @@ async def startup_event():
     await add_employee_id_column()
     await add_manager_id_column()
     await upgrade_database()
+    await add_performance_indexes()
+    await normalize_shift_schedule_configs()
     
     print("="*60)
     print("All migrations completed!")
@@ -263,6 +372,238 @@ async def startup_event():
 
 # =============== HELPER FUNCTIONS ===============
 
+# Lightweight schedule row for generate_schedules' in-memory index; covers both
+# rows loaded from the database and schedules created during the run
+ScheduleSlot = namedtuple(
+    'ScheduleSlot', ['id', 'employee_id', 'date', 'start_time', 'end_time', 'status', 'work_hours']
+)
+
+
+def schedule_work_hours(start_time: Optional[str], end_time: Optional[str], break_minutes: Optional[int]) -> float:
+    """
+    Work hours of a schedule for generate_schedules' hour limits: end minus start
+    (no wrap past midnight, unlike span_hours) minus the role break.
+    
+    Returns 0 when either time is missing or cannot be parsed.
+    """
+    if not (start_time and end_time):
+        return 0
+    try:
+        start = datetime.strptime(start_time, '%H:%M')
+        end = datetime.strptime(end_time, '%H:%M')
+    except (ValueError, TypeError):
+        return 0
+    return (end - start).total_seconds() / 3600 - (break_minutes or 0) / 60
+
+
+def strict_loading() -> tuple:
+    """
+    Loader options for queries whose rows are never expected to lazy-load.
+    
+    With DEBUG=1 any relationship access on those rows raises instead of
+    silently issuing one SELECT per object; in production it is a no-op.
+    """
+    return (raiseload('*'),) if settings.DEBUG else ()
+
+# Cell styles for the leave & comp-off report, built once and shared by every workbook
+REPORT_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+REPORT_TITLE_FONT = Font(bold=True, size=14)
+REPORT_SECTION_FONT = Font(bold=True, size=12)
+REPORT_HEADER_STYLE = dict(
+    font=Font(bold=True, color="FFFFFF"),
+    fill=PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid"),
+    border=REPORT_BORDER,
+    alignment=Alignment(horizontal='center')
+)
+REPORT_SUMMARY_LABEL_STYLE = dict(
+    font=Font(bold=True),
+    fill=PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid"),
+    border=REPORT_BORDER
+)
+REPORT_SUMMARY_VALUE_STYLE = dict(fill=REPORT_SUMMARY_LABEL_STYLE['fill'], border=REPORT_BORDER)
+
+# Column widths for the employee monthly attendance export
+EMPLOYEE_SUMMARY_WIDTHS = [('A', 30), ('B', 20)]
+EMPLOYEE_DAILY_WIDTHS = [
+    ('A', 14), ('B', 14), ('C', 18), ('D', 12), ('E', 12), ('F', 14), ('G', 20),  # G: Night Hours
+    ('H', 12), ('I', 16), ('J', 12), ('K', 15), ('L', 15), ('M', 20),
+]
+
+
+def _write_only_cell(ws, value, font=None, fill=None, border=None, alignment=None) -> WriteOnlyCell:
+    """
+    Build a cell for a write-only worksheet with the given (shared) style objects.
+    """
+    cell = WriteOnlyCell(ws, value=value)
+    if font is not None:
+        cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    if border is not None:
+        cell.border = border
+    if alignment is not None:
+        cell.alignment = alignment
+    return cell
+
+
+def _write_only_row(ws, values, style: str) -> list:
+    """
+    Build a row of write-only cells that all use the given named style.
+    """
+    cells = [WriteOnlyCell(ws, value=value) for value in values]
+    for cell in cells:
+        cell.style = style
+    return cells
+
+
+def write_kv(sheet, row, label, value, label_font, fill, border, right_align):
+    """
+    Write a styled label/value pair into columns A and B of a summary sheet row.
+    """
+    a = sheet.cell(row=row, column=1)
+    a.value = label
+    a.font = label_font
+    a.fill = fill
+    a.border = border
+    b = sheet.cell(row=row, column=2)
+    b.value = value
+    b.border = border
+    b.alignment = right_align
+
+
+async def get_or_create_comp_off_tracking(db: AsyncSession, employee_id: int) -> CompOffTracking:
+    """
+    Get an employee's comp-off tracking record, creating it on first access.
+    
+    The insert is ON CONFLICT DO NOTHING on the unique employee_id, so two
+    concurrent first requests can't create duplicates or fail with a
+    unique violation; the loser simply re-reads the winner's row.
+    """
+    tracking_result = await db.execute(
+        select(CompOffTracking).filter(CompOffTracking.employee_id == employee_id)
+    )
+    tracking = tracking_result.scalar_one_or_none()
+    if tracking:
+        return tracking
+    
+    insert_result = await db.execute(
+        pg_insert(CompOffTracking)
+        .values(employee_id=employee_id)
+        .on_conflict_do_nothing(index_elements=['employee_id'])
+        .returning(CompOffTracking)
+    )
+    tracking = insert_result.scalar_one_or_none()
+    await db.commit()
+    
+    if tracking is None:
+        tracking_result = await db.execute(
+            select(CompOffTracking).filter(CompOffTracking.employee_id == employee_id)
+        )
+        tracking = tracking_result.scalar_one()
+    return tracking
+
+
+def fmt2(x) -> str:
+    """Format a number with two decimals for Excel exports, '-' when empty/zero."""
+    return f"{x:.2f}" if x else '-'
+
+
+def fmti(x) -> str:
+    """Format a whole-number value for Excel exports, '-' when empty/zero."""
+    return str(x) if x else '-'
+
+
+async def iter_file_chunks(buf, chunk_size: int = 65536):
+    """
+    Yield the remaining contents of a file-like buffer in fixed-size chunks.
+    
+    Used for Excel downloads so StreamingResponse sends the saved workbook
+    without first copying the whole BytesIO with getvalue(). Reading an
+    in-memory buffer never blocks, so this is an async generator and
+    Starlette does not hop to the threadpool for every chunk.
+    """
+    while True:
+        data = buf.read(chunk_size)
+        if not data:
+            break
+        yield data
+
+
+def cacheable_json_response(request: Request, content: dict, max_age: int = 86400) -> Response:
+    """
+    JSON response with Cache-Control and a content-hash ETag.
+    
+    For deterministic endpoints (calendar data). A request whose
+    If-None-Match matches the ETag gets an empty 304 instead of the body.
+    Serialized with orjson, which also encodes date values as ISO strings.
+    """
+    body = orjson.dumps(content, option=orjson.OPT_SORT_KEYS)
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    headers = {"Cache-Control": f"public, max-age={max_age}", "ETag": etag}
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@lru_cache(maxsize=256)
+def _jp_holidays_for(year: int, month: int) -> MappingProxyType:
+    """
+    Get Japanese public holidays for a calendar month as {date: name}.
+    
+    Cached per (year, month) and shared across requests, so the result is
+    returned as a read-only mapping.
+    """
+    start_date = date(year, month, 1)
+    end_date = date(year, month, monthrange(year, month)[1])
+    return MappingProxyType(jp_calendar.get_holidays_in_range(start_date, end_date))
+
+
+def leave_day_count(leave) -> float:
+    """
+    Number of leave days a leave request accounts for.
+    
+    Half-day leaves count as 0.5, everything else as the inclusive
+    number of days between start_date and end_date.
+    """
+    if leave.duration_type and leave.duration_type.startswith('half_day'):
+        return 0.5
+    return (leave.end_date - leave.start_date).days + 1
+
+
+def span_hours(in_time, out_time):
+    """
+    Hours between two HH:MM times (check-in/out or shift start/end), wrapping past midnight.
+    
+    Returns None when either time is missing or cannot be parsed.
+    """
+    if not in_time or not out_time:
+        return None
+    # Times are stored as "HH:MM" strings already, so partition
+    # them directly rather than going through str() and a split() list
+    in_h, _, in_m = in_time.partition(':')
+    out_h, _, out_m = out_time.partition(':')
+    try:
+        in_decimal = int(in_h) + int(in_m[:2]) / 60
+        out_decimal = int(out_h) + int(out_m[:2]) / 60
+    except ValueError:
+        return None
+    return out_decimal - in_decimal if out_decimal > in_decimal else 24 - in_decimal + out_decimal
+
+
+# SQL counterpart of leave_day_count() for aggregating leave days in queries
+LEAVE_DAYS_SQL = case(
+    (LeaveRequest.duration_type.like('half_day%'), literal_column('0.5')),
+    else_=LeaveRequest.end_date - LeaveRequest.start_date + 1
+)
+
+
 def get_cycle_dates(employment_type: str, reference_date: date = None):
     """
     Get the start and end dates of the current cycle based on employment type.
@@ -350,11 +691,91 @@ async def general_exception_handler(request: Request, exc: Exception):
 
 # ===== CONSTRAINT VALIDATION HELPER FUNCTIONS =====
 
+@lru_cache(maxsize=4096)
+def week_bounds(target_date: date) -> tuple[date, date]:
+    """Return the (Monday, Sunday) of the week containing target_date"""
+    week_start = target_date - timedelta(days=target_date.weekday())
+    return week_start, week_start + timedelta(days=6)
+
+
+async def load_week_schedules(employee_id: int, target_date: date, db: AsyncSession) -> list:
+    """
+    Load the employee's schedules for the Mon-Sun week containing target_date.
+    
+    Returns lightweight rows (id, date, start_time, end_time, status) that the
+    constraint validators and create_schedule can share instead of each
+    querying the same week again.
+    """
+    week_start, week_end = week_bounds(target_date)
+    
+    result = await db.execute(
+        select(Schedule.id, Schedule.date, Schedule.start_time, Schedule.end_time, Schedule.status)
+        .filter(
+            Schedule.employee_id == employee_id,
+            Schedule.date >= week_start,
+            Schedule.date <= week_end
+        )
+        .order_by(Schedule.date)
+    )
+    return result.all()
+
+
+# Statuses counted by the 5-shifts-per-week rule: every Mon-Fri entry fulfils the
+# requirement, while on Sat-Sun only regular shifts count (comp-off there is a bonus)
+WEEKDAY_COVERAGE_STATUSES = frozenset({'scheduled', 'leave', 'comp_off_taken', 'comp_off_earned', 'leave_half_morning', 'leave_half_afternoon'})
+WEEKEND_SHIFT_STATUSES = frozenset({'scheduled', 'leave', 'leave_half_morning', 'leave_half_afternoon'})
+
+
+def check_shifts_per_week(
+    target_date: date,
+    week_info: dict,
+    weekday_coverage: int,
+    weekend_regular_shifts: int
+) -> tuple[bool, str]:
+    """
+    Apply the 5-shifts-per-week rule to already counted shifts of target_date's week
+    
+    week_info comes from jp_calendar.get_week_info() for the week's Monday.
+    
+    Returns: (is_valid, error_message)
+    """
+    # Get required shifts for this week (considering Japanese holidays)
+    required_shifts = week_info['required_shifts']
+    
+    # Check if target is weekday or weekend
+    target_weekday = target_date.weekday()  # 0=Mon, 5=Sat, 6=Sun
+    
+    if target_weekday >= 5:
+        # Weekend (Sat-Sun) shift
+        # Check if weekday requirement is already met
+        if weekday_coverage >= required_shifts:
+            return False, f"Cannot assign weekend shift on {target_date} - weekday requirement already met. Employee has {weekday_coverage} weekday shifts/comp-offs (required: {required_shifts}){week_holiday_note(week_info)}"
+        # Weekend regular shifts also count toward total
+        total_shifts = weekday_coverage + weekend_regular_shifts
+        if total_shifts >= required_shifts:
+            return False, f"Cannot assign more than {required_shifts} shifts per week. Employee has {weekday_coverage} weekday + {weekend_regular_shifts} weekend shifts (total: {total_shifts}){week_holiday_note(week_info)}"
+    else:
+        # Weekday (Mon-Fri) shift
+        if weekday_coverage >= required_shifts:
+            return False, f"Cannot assign more than {required_shifts} weekday shifts per week. Employee already has {weekday_coverage} weekday shifts/comp-offs (required: {required_shifts}){week_holiday_note(week_info)} (Mon-Sun: {week_info['week_start']} to {week_info['week_end']})"
+    
+    return True, ""
+
+
+def week_holiday_note(week_info: dict) -> str:
+    """Error message suffix naming the week's weekday holidays, if any"""
+    if week_info['weekday_holiday_count'] == 0:
+        return ""
+    holiday_names = [day['holiday_name'] for day in week_info['days'] if day['holiday_name']]
+    return f" (Contains {week_info['weekday_holiday_count']} weekday holiday(s): {', '.join(holiday_names)})"
+
+
 async def validate_5_shifts_per_week(
     employee_id: int, 
     target_date: date, 
     db: AsyncSession,
-    exclude_schedule_id: Optional[int] = None
+    exclude_schedule_id: Optional[int] = None,
+    week_schedules: Optional[list] = None
 ) -> tuple[bool, str]:
     """
     Validate that employee doesn't exceed required shifts per week
@@ -365,71 +786,34 @@ async def validate_5_shifts_per_week(
     - Exception 2: Comp-off taken/earned on Mon-Fri counts as fulfilling shift requirement
     - Exception 3: Comp-off earned/taken on Sat-Sun are bonus shifts (don't count)
     
+    week_schedules can be passed in from load_week_schedules() to reuse rows
+    the caller already loaded.
+    
     Returns: (is_valid, error_message)
     """
-    week_start = target_date - timedelta(days=target_date.weekday())
-    week_end = week_start + timedelta(days=6)
+    week_start, week_end = week_bounds(target_date)
     
-    # Get required shifts for this week (considering Japanese holidays)
-    required_shifts = jp_calendar.get_shifts_required_for_week(week_start)
+    # Week info (holidays) drives both the required shift count and the error text
+    week_info = jp_calendar.get_week_info(week_start)
+    
+    if week_schedules is None:
+        week_schedules = await load_week_schedules(employee_id, target_date, db)
+    if exclude_schedule_id is not None:
+        week_schedules = [sched for sched in week_schedules if sched.id != exclude_schedule_id]
     
     # Count WEEKDAY (Mon-Fri) coverage: regular shifts + comp-off (both count toward requirement)
-    weekday_coverage_query = select(func.count(Schedule.id)).filter(
-        Schedule.employee_id == employee_id,
-        Schedule.date >= week_start,
-        Schedule.date <= week_end,
-        Schedule.status.in_(['scheduled', 'leave', 'comp_off_taken', 'comp_off_earned', 'leave_half_morning', 'leave_half_afternoon']),
-        # Only count Mon-Fri (1=Mon, 5=Fri in PostgreSQL extraction)
-        func.extract('dow', Schedule.date).in_([1, 2, 3, 4, 5])
+    weekday_coverage = sum(
+        1 for sched in week_schedules
+        if sched.date.weekday() < 5 and sched.status in WEEKDAY_COVERAGE_STATUSES
     )
     
-    if exclude_schedule_id:
-        weekday_coverage_query = weekday_coverage_query.filter(Schedule.id != exclude_schedule_id)
-    
-    result = await db.execute(weekday_coverage_query)
-    weekday_coverage = result.scalar() or 0
-    
     # Count weekend (Sat-Sun) shifts - only comp-off (earning extra time off) don't count
-    weekend_regular_query = select(func.count(Schedule.id)).filter(
-        Schedule.employee_id == employee_id,
-        Schedule.date >= week_start,
-        Schedule.date <= week_end,
-        Schedule.status.in_(['scheduled', 'leave', 'leave_half_morning', 'leave_half_afternoon']),  # Regular shifts only
-        # Only count Sat-Sun (6=Sat, 0=Sun in PostgreSQL extraction)
-        func.extract('dow', Schedule.date).in_([6, 0])
+    weekend_regular_shifts = sum(
+        1 for sched in week_schedules
+        if sched.date.weekday() >= 5 and sched.status in WEEKEND_SHIFT_STATUSES
     )
     
-    if exclude_schedule_id:
-        weekend_regular_query = weekend_regular_query.filter(Schedule.id != exclude_schedule_id)
-    
-    result = await db.execute(weekend_regular_query)
-    weekend_regular_shifts = result.scalar() or 0
-    
-    # Get week info for detailed error messaging
-    week_info = jp_calendar.get_week_info(week_start)
-    holiday_str = ""
-    if week_info['weekday_holiday_count'] > 0:
-        holiday_names = [day['holiday_name'] for day in week_info['days'] if day['holiday_name']]
-        holiday_str = f" (Contains {week_info['weekday_holiday_count']} weekday holiday(s): {', '.join(holiday_names)})"
-    
-    # Check if target is weekday or weekend
-    target_weekday = target_date.weekday()  # 0=Mon, 5=Sat, 6=Sun
-    
-    if target_weekday >= 5:
-        # Weekend (Sat-Sun) shift
-        # Check if weekday requirement is already met
-        if weekday_coverage >= required_shifts:
-            return False, f"Cannot assign weekend shift on {target_date} - weekday requirement already met. Employee has {weekday_coverage} weekday shifts/comp-offs (required: {required_shifts}){holiday_str}"
-        # Weekend regular shifts also count toward total
-        total_shifts = weekday_coverage + weekend_regular_shifts
-        if total_shifts >= required_shifts:
-            return False, f"Cannot assign more than {required_shifts} shifts per week. Employee has {weekday_coverage} weekday + {weekend_regular_shifts} weekend shifts (total: {total_shifts}){holiday_str}"
-    else:
-        # Weekday (Mon-Fri) shift
-        if weekday_coverage >= required_shifts:
-            return False, f"Cannot assign more than {required_shifts} weekday shifts per week. Employee already has {weekday_coverage} weekday shifts/comp-offs (required: {required_shifts}){holiday_str} (Mon-Sun: {week_start} to {week_end})"
-    
-    return True, ""
+    return check_shifts_per_week(target_date, week_info, weekday_coverage, weekend_regular_shifts)
 
 
 async def validate_consecutive_shifts_limit(
@@ -437,37 +821,35 @@ async def validate_consecutive_shifts_limit(
     target_date: date,
     db: AsyncSession,
     exclude_schedule_id: Optional[int] = None,
-    max_consecutive: int = 5
+    max_consecutive: int = 5,
+    week_schedules: Optional[list] = None
 ) -> tuple[bool, str]:
     """
     Validate that adding a shift on target_date doesn't exceed consecutive shift limit
-    Returns: (is_valid, error_message)
-    """
-    week_start = target_date - timedelta(days=target_date.weekday())
-    week_end = week_start + timedelta(days=6)
-    
-    query = select(Schedule).filter(
-        Schedule.employee_id == employee_id,
-        Schedule.date >= week_start,
-        Schedule.date <= week_end,
-        Schedule.status.in_(['scheduled', 'leave', 'comp_off_taken', 'leave_half_morning', 'leave_half_afternoon'])
-    ).order_by(Schedule.date)
     
-    if exclude_schedule_id:
-        query = query.filter(Schedule.id != exclude_schedule_id)
+    week_schedules can be passed in from load_week_schedules() to reuse rows
+    the caller already loaded.
     
-    result = await db.execute(query)
-    existing_schedules = result.scalars().all()
+    Returns: (is_valid, error_message)
+    """
+    if week_schedules is None:
+        week_schedules = await load_week_schedules(employee_id, target_date, db)
+    
+    counted_statuses = {'scheduled', 'leave', 'comp_off_taken', 'leave_half_morning', 'leave_half_afternoon'}
+    existing_schedules = [
+        sched for sched in week_schedules
+        if sched.status in counted_statuses
+        and (exclude_schedule_id is None or sched.id != exclude_schedule_id)
+    ]
     
-    # Collect all dates including the new one
-    all_dates = sorted([s.date for s in existing_schedules] + [target_date])
-    all_dates = list(dict.fromkeys(all_dates))  # Remove duplicates while preserving order
+    # Collect all dates including the new one, as day ordinals so neighbours differ by 1
+    day_ordinals = sorted({s.date.toordinal() for s in existing_schedules} | {target_date.toordinal()})
     
     # Find the longest consecutive sequence
     max_consecutive_found = 1
     current_consecutive = 1
-    for i in range(1, len(all_dates)):
-        if (all_dates[i] - all_dates[i-1]).days == 1:
+    for i in range(1, len(day_ordinals)):
+        if day_ordinals[i] - day_ordinals[i-1] == 1:
             current_consecutive += 1
             max_consecutive_found = max(max_consecutive_found, current_consecutive)
         else:
@@ -540,26 +922,9 @@ async def login(
 
 @app.get("/users/me", response_model=UserResponse)
 async def read_users_me(
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
-    # For managers, include their department_id
-    if current_user.user_type == UserType.MANAGER:
-        mgr_result = await db.execute(select(Manager).filter(Manager.user_id == current_user.id))
-        manager = mgr_result.scalar_one_or_none()
-        if manager:
-            # Create a response with manager_department_id
-            response_dict = {
-                "id": current_user.id,
-                "username": current_user.username,
-                "email": current_user.email,
-                "full_name": current_user.full_name,
-                "user_type": current_user.user_type,
-                "is_active": current_user.is_active,
-                "manager_department_id": manager.department_id
-            }
-            return response_dict
-    
+    # For managers, manager_department_id was resolved along with the user
     return current_user
 
 
@@ -1483,26 +1848,42 @@ async def delete_role(
     return {"message": "Role and associated shifts deleted successfully"}
 
 # Helper functions to resolve department ownership
-async def get_user_department(user: User, db: AsyncSession) -> Optional[int]:
-    """Resolve the department for a manager or employee user"""
+def user_department_query(user: User):
+    """
+    SELECT of the department id for a manager or employee user.
+    
+    Returns None for other user types. Callers can execute it directly or
+    embed it as a scalar subquery to avoid a separate round-trip.
+    """
     if user.user_type == UserType.MANAGER:
-        result = await db.execute(select(Manager).filter(Manager.user_id == user.id))
-        manager = result.scalar_one_or_none()
-        return manager.department_id if manager else None
+        return select(Manager.department_id).filter(Manager.user_id == user.id)
     
     if user.user_type == UserType.EMPLOYEE:
-        result = await db.execute(select(Employee).filter(Employee.user_id == user.id))
-        employee = result.scalar_one_or_none()
-        return employee.department_id if employee else None
+        return select(Employee.department_id).filter(Employee.user_id == user.id)
     
     return None
 
 
+async def get_user_department(user: User, db: AsyncSession) -> Optional[int]:
+    """Resolve the department for a manager or employee user"""
+    query = user_department_query(user)
+    if query is None:
+        return None
+    
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
+
+
 async def get_manager_department(user: User, db: AsyncSession) -> Optional[int]:
     """Get the department ID for a manager user"""
     if user.user_type != UserType.MANAGER:
         return None
     
+    # Already resolved by get_current_user for authenticated requests
+    department_id = getattr(user, 'manager_department_id', None)
+    if department_id is not None:
+        return department_id
+    
     return await get_user_department(user, db)
 
 
@@ -1895,7 +2276,9 @@ async def record_attendance(
         # Get schedule
         schedule_id = attendance_data.get('schedule_id')
         schedule_result = await db.execute(
-            select(Schedule).filter(Schedule.id == schedule_id)
+            select(Schedule)
+            .options(selectinload(Schedule.role))
+            .filter(Schedule.id == schedule_id)
         )
         schedule = schedule_result.scalar_one_or_none()
         
@@ -2212,8 +2595,12 @@ async def export_monthly_attendance(
             bottom=Side(style='thin')
         )
         center_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        cell_center_alignment = Alignment(horizontal='center', vertical='center')
+        left_alignment = Alignment(horizontal='left', vertical='center')
+        right_alignment = Alignment(horizontal='right')
         summary_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
         summary_font = Font(bold=True, color="000000")
+        even_fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
         
         # Create Summary Sheet First
         summary_ws = wb.active
@@ -2231,22 +2618,18 @@ async def export_monthly_attendance(
         summary_ws['A3'] = ""
         
         # Get all dates in the month to calculate statistics
-        from dateutil.rrule import rrule, DAILY
         import datetime
-        all_dates = list(rrule(DAILY, dtstart=start_date, until=end_date))
+        all_dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
         
         # Calculate public holidays and weekends
-        from app.holidays_jp import JapaneseCalendar
-        jp_calendar = JapaneseCalendar()
-        jp_holidays_dict = jp_calendar.get_holidays_in_range(start_date, end_date)
+        jp_holidays_dict = _jp_holidays_for(year, month)
         
         # Count working days, holidays, weekends
         public_holidays = 0
         weekends = 0
         working_days_available = 0
         
-        for current_date in all_dates:
-            date_obj = current_date.date() if hasattr(current_date, 'date') else current_date
+        for date_obj in all_dates:
             is_weekend = date_obj.weekday() >= 5  # Saturday = 5, Sunday = 6
             is_public_holiday = date_obj in jp_holidays_dict
             
@@ -2291,32 +2674,28 @@ async def export_monthly_attendance(
         
         row = 5
         for label, value in summary_data:
-            summary_ws[f'A{row}'] = label
-            summary_ws[f'B{row}'] = value
-            if label:  # Skip empty rows
-                summary_ws[f'A{row}'].font = summary_font
-                summary_ws[f'A{row}'].fill = summary_fill
-                summary_ws[f'B{row}'].border = border
-                summary_ws[f'B{row}'].alignment = Alignment(horizontal='right')
-            summary_ws[f'A{row}'].border = border
+            if label:
+                write_kv(summary_ws, row, label, value, summary_font, summary_fill, border, right_alignment)
+            else:  # Spacer rows only get a border on column A
+                summary_ws.cell(row=row, column=1, value=label).border = border
+                summary_ws.cell(row=row, column=2, value=value)
             row += 1
         
         # Holiday Details
         holiday_row = row + 1
-        summary_ws[f'A{holiday_row}'] = "PUBLIC HOLIDAYS IN THIS MONTH"
-        summary_ws[f'A{holiday_row}'].font = section_font
-        summary_ws[f'A{holiday_row}'].fill = summary_fill
-        summary_ws[f'A{holiday_row}'].border = border
-        summary_ws[f'B{holiday_row}'].fill = summary_fill
-        summary_ws[f'B{holiday_row}'].border = border
-        summary_ws.merge_cells(f'A{holiday_row}:B{holiday_row}')
+        a = summary_ws.cell(row=holiday_row, column=1, value="PUBLIC HOLIDAYS IN THIS MONTH")
+        a.font = section_font
+        a.fill = summary_fill
+        a.border = border
+        b = summary_ws.cell(row=holiday_row, column=2)
+        b.fill = summary_fill
+        b.border = border
+        summary_ws.merge_cells(start_row=holiday_row, start_column=1, end_row=holiday_row, end_column=2)
         
         holiday_row += 1
         for holiday_date, holiday_name in jp_holidays_dict.items():
-            summary_ws[f'A{holiday_row}'] = holiday_date.isoformat()
-            summary_ws[f'B{holiday_row}'] = holiday_name
-            summary_ws[f'A{holiday_row}'].border = border
-            summary_ws[f'B{holiday_row}'].border = border
+            summary_ws.cell(row=holiday_row, column=1, value=holiday_date.isoformat()).border = border
+            summary_ws.cell(row=holiday_row, column=2, value=holiday_name).border = border
             holiday_row += 1
         
         # Adjust column widths for summary
@@ -2357,13 +2736,9 @@ async def export_monthly_attendance(
             )
         )
         schedules = sched_result.scalars().all()
-        schedule_map = {}
-        comp_off_earned_map = {}
-        for sched in schedules:
-            schedule_map[(sched.employee_id, sched.date)] = sched
-            # Track comp-off earned days
-            if sched.status == 'comp_off_earned':
-                comp_off_earned_map[(sched.employee_id, sched.date)] = True
+        schedule_map = {(s.employee_id, s.date): s for s in schedules}
+        # Track comp-off earned days
+        comp_off_earned_keys = {(s.employee_id, s.date) for s in schedules if s.status == 'comp_off_earned'}
 
         # Get comp-off details for used days
         compoff_details_result = await db.execute(
@@ -2375,10 +2750,10 @@ async def export_monthly_attendance(
             )
         )
         compoff_details = compoff_details_result.scalars().all()
-        comp_off_used_map = {}
-        for detail in compoff_details:
-            detail_date = detail.date.date() if hasattr(detail.date, 'date') else detail.date
-            comp_off_used_map[(detail.employee_id, detail_date)] = True
+        comp_off_used_keys = {
+            (d.employee_id, d.date.date() if hasattr(d.date, 'date') else d.date)
+            for d in compoff_details
+        }
         
         # Get approved leave requests for the month
         leaves_result = await db.execute(
@@ -2391,17 +2766,16 @@ async def export_monthly_attendance(
         )
         leave_requests = leaves_result.scalars().all()
         # Create a map of (employee_id, date) -> leave info
-        leave_map = {}
-        for leave in leave_requests:
-            for i in range((leave.end_date - leave.start_date).days + 1):
-                current_date = leave.start_date + timedelta(days=i)
-                if start_date <= current_date <= end_date:
-                    leave_info = {
-                        'leave_type': leave.leave_type,
-                        'duration_type': leave.duration_type or 'full_day',
-                        'days': 0.5 if leave.duration_type and leave.duration_type.startswith('half_day') else 1.0
-                    }
-                    leave_map[(leave.employee_id, current_date)] = leave_info
+        leave_map = {
+            (leave.employee_id, leave_date): {
+                'leave_type': leave.leave_type,
+                'duration_type': leave.duration_type or 'full_day',
+                'days': 0.5 if leave.duration_type and leave.duration_type.startswith('half_day') else 1.0
+            }
+            for leave in leave_requests
+            for leave_date in (leave.start_date + timedelta(days=i) for i in range((leave.end_date - leave.start_date).days + 1))
+            if start_date <= leave_date <= end_date
+        }
 
         # Data - Similar to weekly format
         row = 5
@@ -2424,8 +2798,8 @@ async def export_monthly_attendance(
                         pass
 
                 # Check if comp-off earned or used on this date
-                comp_off_earned_str = '✓ Yes' if comp_off_earned_map.get((record.employee_id, record.date)) else '-'
-                comp_off_used_str = '✓ Yes' if comp_off_used_map.get((record.employee_id, record.date)) else '-'
+                comp_off_earned_str = '✓ Yes' if (record.employee_id, record.date) in comp_off_earned_keys else '-'
+                comp_off_used_str = '✓ Yes' if (record.employee_id, record.date) in comp_off_used_keys else '-'
                 
                 # Get leave info for this date - check both LeaveRequest and Schedule status
                 leave_info = leave_map.get((record.employee_id, record.date))
@@ -2456,9 +2830,9 @@ async def export_monthly_attendance(
                 ws.cell(row=row, column=6).value = total_hrs_assigned
                 ws.cell(row=row, column=7).value = record.in_time or '-'
                 ws.cell(row=row, column=8).value = record.out_time or '-'
-                ws.cell(row=row, column=9).value = f"{record.worked_hours:.2f}" if record.worked_hours else '-'
-                ws.cell(row=row, column=10).value = f"{record.break_minutes}" if record.break_minutes else '-'
-                ws.cell(row=row, column=11).value = f"{record.overtime_hours:.2f}" if record.overtime_hours else '-'
+                ws.cell(row=row, column=9).value = fmt2(record.worked_hours)
+                ws.cell(row=row, column=10).value = fmti(record.break_minutes)
+                ws.cell(row=row, column=11).value = fmt2(record.overtime_hours)
                 ws.cell(row=row, column=12).value = record.status or '-'
                 ws.cell(row=row, column=13).value = comp_off_earned_str
                 ws.cell(row=row, column=14).value = comp_off_used_str
@@ -2467,10 +2841,10 @@ async def export_monthly_attendance(
                 for col in range(1, 15):
                     cell = ws.cell(row=row, column=col)
                     cell.border = border
-                    cell.alignment = Alignment(horizontal='center', vertical='center') if col in [1, 3, 7, 8, 9, 10, 11, 12, 13, 14] else Alignment(horizontal='left', vertical='center')
+                    cell.alignment = cell_center_alignment if col in {1, 3, 7, 8, 9, 10, 11, 12, 13, 14} else left_alignment
                     # Alternate row colors for better readability
                     if row % 2 == 0:
-                        cell.fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
+                        cell.fill = even_fill
                 
                 row += 1
         
@@ -2499,7 +2873,7 @@ async def export_monthly_attendance(
         file_bytes.seek(0)
 
         return StreamingResponse(
-            iter([file_bytes.getvalue()]),
+            iter_file_chunks(file_bytes),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
                 "Content-Disposition": f"attachment; filename={department.name}_attendance_{year}-{month:02d}{'_' + employment_type if employment_type else ''}.xlsx"
@@ -2569,9 +2943,7 @@ async def export_monthly_comprehensive_attendance(
         checkin_records = checkin_result.scalars().all()
         
         # Create checkin map for easy lookup
-        checkin_map = {}
-        for record in checkin_records:
-            checkin_map[(record.employee_id, record.date)] = record
+        checkin_map = {(c.employee_id, c.date): c for c in checkin_records}
 
         # Get schedules
         sched_result = await db.execute(
@@ -2582,9 +2954,7 @@ async def export_monthly_comprehensive_attendance(
             )
         )
         schedules = sched_result.scalars().all()
-        schedule_map = {}
-        for sched in schedules:
-            schedule_map[(sched.employee_id, sched.date)] = sched
+        schedule_map = {(s.employee_id, s.date): s for s in schedules}
 
         # Get approved leave requests
         leaves_result = await db.execute(
@@ -2596,16 +2966,15 @@ async def export_monthly_comprehensive_attendance(
             )
         )
         leave_requests = leaves_result.scalars().all()
-        leave_map = {}
-        for leave in leave_requests:
-            for i in range((leave.end_date - leave.start_date).days + 1):
-                current_date = leave.start_date + timedelta(days=i)
-                if start_date <= current_date <= end_date:
-                    leave_info = {
-                        'leave_type': leave.leave_type,
-                        'duration_type': leave.duration_type or 'full_day',
-                    }
-                    leave_map[(leave.employee_id, current_date)] = leave_info
+        leave_map = {
+            (leave.employee_id, leave_date): {
+                'leave_type': leave.leave_type,
+                'duration_type': leave.duration_type or 'full_day',
+            }
+            for leave in leave_requests
+            for leave_date in (leave.start_date + timedelta(days=i) for i in range((leave.end_date - leave.start_date).days + 1))
+            if start_date <= leave_date <= end_date
+        }
 
         # Create workbook
         wb = Workbook()
@@ -2617,6 +2986,10 @@ async def export_monthly_comprehensive_attendance(
         header_font = Font(bold=True, color="FFFFFF", size=11)
         emp_header_fill = PatternFill(start_color="70AD47", end_color="70AD47", fill_type="solid")
         emp_header_font = Font(bold=True, color="FFFFFF", size=10)
+        emp_info_font = Font(size=10)
+        header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        cell_center_alignment = Alignment(horizontal='center', vertical='center')
+        left_alignment = Alignment(horizontal='left', vertical='center')
         border = Border(
             left=Side(style='thin'),
             right=Side(style='thin'),
@@ -2644,9 +3017,10 @@ async def export_monthly_comprehensive_attendance(
         summary_ws['A7'] = "Month"
         summary_ws['B7'] = f"{calendar.month_name[month]} {year}"
         
+        label_font = Font(bold=True)
         for row in range(5, 8):
-            summary_ws[f'A{row}'].font = Font(bold=True)
-            summary_ws[f'B{row}'].border = border
+            summary_ws.cell(row=row, column=1).font = label_font
+            summary_ws.cell(row=row, column=2).border = border
         
         summary_ws.column_dimensions['A'].width = 25
         summary_ws.column_dimensions['B'].width = 15
@@ -2679,7 +3053,7 @@ async def export_monthly_comprehensive_attendance(
             # Employee info row
             emp_info = f"ID: {employee.employee_id} | Name: {employee.first_name} {employee.last_name} | Email: {employee.email} | Phone: {employee.phone or 'N/A'}"
             details_ws[f'A{current_row}'] = emp_info
-            details_ws[f'A{current_row}'].font = Font(size=10)
+            details_ws[f'A{current_row}'].font = emp_info_font
             details_ws.merge_cells(f'A{current_row}:M{current_row}')
             current_row += 1
             
@@ -2690,7 +3064,7 @@ async def export_monthly_comprehensive_attendance(
                 cell.value = header
                 cell.fill = header_fill
                 cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+                cell.alignment = header_alignment
                 cell.border = border
             current_row += 1
             
@@ -2698,12 +3072,10 @@ async def export_monthly_comprehensive_attendance(
             emp_attendance = [r for r in attendance_records if r.employee_id == employee.id]
             
             # Generate all dates and show attendance
-            from dateutil.rrule import rrule, DAILY
-            all_dates = list(rrule(DAILY, dtstart=start_date, until=end_date))
+            all_dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
             
-            for current_date in all_dates:
-                date_obj = current_date.date() if hasattr(current_date, 'date') else current_date
-                day_name = date_obj.strftime('%A')[:3]
+            for date_obj in all_dates:
+                day_name = WEEKDAY_NAMES[date_obj.weekday()][:3]
                 
                 # Get attendance record for this date
                 att_rec = next((r for r in emp_attendance if r.date == date_obj), None)
@@ -2791,7 +3163,7 @@ async def export_monthly_comprehensive_attendance(
                 for col in range(1, 12):
                     cell = details_ws.cell(row=current_row, column=col)
                     cell.border = border
-                    cell.alignment = Alignment(horizontal='center' if col != 11 else 'left', vertical='center')
+                    cell.alignment = cell_center_alignment if col != 11 else left_alignment
                 
                 current_row += 1
             
@@ -2817,7 +3189,7 @@ async def export_monthly_comprehensive_attendance(
         file_bytes.seek(0)
 
         return StreamingResponse(
-            iter([file_bytes.getvalue()]),
+            iter_file_chunks(file_bytes),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={"Content-Disposition": f"attachment; filename={department.name}_complete_attendance_{year}-{month:02d}.xlsx"}
         )
@@ -2891,8 +3263,12 @@ async def export_weekly_attendance(
             bottom=Side(style='thin')
         )
         center_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        cell_center_alignment = Alignment(horizontal='center', vertical='center')
+        left_alignment = Alignment(horizontal='left', vertical='center')
+        right_alignment = Alignment(horizontal='right')
         summary_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
         summary_font = Font(bold=True, color="000000")
+        even_fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
         
         # Create Summary Sheet First
         summary_ws = wb.active
@@ -2918,13 +3294,9 @@ async def export_weekly_attendance(
             )
         )
         schedules = sched_result.scalars().all()
-        schedule_map = {}
-        comp_off_earned_map = {}
-        for sched in schedules:
-            schedule_map[(sched.employee_id, sched.date)] = sched
-            # Track comp-off earned days
-            if sched.status == 'comp_off_earned':
-                comp_off_earned_map[(sched.employee_id, sched.date)] = True
+        schedule_map = {(s.employee_id, s.date): s for s in schedules}
+        # Track comp-off earned days
+        comp_off_earned_keys = {(s.employee_id, s.date) for s in schedules if s.status == 'comp_off_earned'}
 
         # Get comp-off details for used days
         compoff_details_result = await db.execute(
@@ -2936,10 +3308,10 @@ async def export_weekly_attendance(
             )
         )
         compoff_details = compoff_details_result.scalars().all()
-        comp_off_used_map = {}
-        for detail in compoff_details:
-            detail_date = detail.date.date() if hasattr(detail.date, 'date') else detail.date
-            comp_off_used_map[(detail.employee_id, detail_date)] = True
+        comp_off_used_keys = {
+            (d.employee_id, d.date.date() if hasattr(d.date, 'date') else d.date)
+            for d in compoff_details
+        }
         
         # Calculate totals from attendance records for summary
         total_worked_hours = 0
@@ -2970,13 +3342,7 @@ async def export_weekly_attendance(
         
         row = 5
         for label, value in summary_data:
-            summary_ws[f'A{row}'] = label
-            summary_ws[f'B{row}'] = value
-            summary_ws[f'A{row}'].font = summary_font
-            summary_ws[f'A{row}'].fill = summary_fill
-            summary_ws[f'A{row}'].border = border
-            summary_ws[f'B{row}'].border = border
-            summary_ws[f'B{row}'].alignment = Alignment(horizontal='right')
+            write_kv(summary_ws, row, label, value, summary_font, summary_fill, border, right_alignment)
             row += 1
         
         # Adjust column widths for summary
@@ -3029,8 +3395,8 @@ async def export_weekly_attendance(
                         pass
 
                 # Check if comp-off earned or used on this date
-                comp_off_earned_str = '✓ Yes' if comp_off_earned_map.get((record.employee_id, record.date)) else '-'
-                comp_off_used_str = '✓ Yes' if comp_off_used_map.get((record.employee_id, record.date)) else '-'
+                comp_off_earned_str = '✓ Yes' if (record.employee_id, record.date) in comp_off_earned_keys else '-'
+                comp_off_used_str = '✓ Yes' if (record.employee_id, record.date) in comp_off_used_keys else '-'
 
                 ws.cell(row=row, column=1).value = employee.employee_id
                 ws.cell(row=row, column=2).value = f"{employee.first_name} {employee.last_name}"
@@ -3039,9 +3405,9 @@ async def export_weekly_attendance(
                 ws.cell(row=row, column=5).value = total_hrs_assigned
                 ws.cell(row=row, column=6).value = record.in_time or '-'
                 ws.cell(row=row, column=7).value = record.out_time or '-'
-                ws.cell(row=row, column=8).value = f"{record.worked_hours:.2f}" if record.worked_hours else '-'
-                ws.cell(row=row, column=9).value = f"{record.break_minutes}" if record.break_minutes else '-'
-                ws.cell(row=row, column=10).value = f"{record.overtime_hours:.2f}" if record.overtime_hours else '-'
+                ws.cell(row=row, column=8).value = fmt2(record.worked_hours)
+                ws.cell(row=row, column=9).value = fmti(record.break_minutes)
+                ws.cell(row=row, column=10).value = fmt2(record.overtime_hours)
                 ws.cell(row=row, column=11).value = record.status or '-'
                 ws.cell(row=row, column=12).value = comp_off_earned_str
                 ws.cell(row=row, column=13).value = comp_off_used_str
@@ -3050,10 +3416,10 @@ async def export_weekly_attendance(
                 for col in range(1, 14):
                     cell = ws.cell(row=row, column=col)
                     cell.border = border
-                    cell.alignment = Alignment(horizontal='center', vertical='center') if col in [1, 3, 6, 7, 8, 9, 10, 11, 12, 13] else Alignment(horizontal='left', vertical='center')
+                    cell.alignment = cell_center_alignment if col in {1, 3, 6, 7, 8, 9, 10, 11, 12, 13} else left_alignment
                     # Alternate row colors for better readability
                     if row % 2 == 0:
-                        cell.fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
+                        cell.fill = even_fill
                 
                 row += 1
 
@@ -3081,7 +3447,7 @@ async def export_weekly_attendance(
         file_bytes.seek(0)
 
         return StreamingResponse(
-            iter([file_bytes.getvalue()]),
+            iter_file_chunks(file_bytes),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
                 "Content-Disposition": f"attachment; filename={department.name}_attendance_weekly_{start_date.isoformat()}_to_{end_date.isoformat()}{'_' + employment_type if employment_type else ''}.xlsx"
@@ -3200,9 +3566,23 @@ async def export_employee_monthly_attendance(
         )
         attendance_records = att_result.scalars().all()
         
-        # Get leave records for the month
-        leave_result = await db.execute(
-            select(LeaveRequest).filter(
+        # Hours totals for the summary sheet
+        totals_result = await db.execute(
+            select(
+                func.coalesce(func.sum(Attendance.worked_hours), 0),
+                func.coalesce(func.sum(Attendance.overtime_hours), 0),
+                func.count(case((Attendance.worked_hours > 0, 1)))
+            ).filter(
+                Attendance.employee_id == employee.id,
+                Attendance.date >= start_date,
+                Attendance.date <= end_date
+            )
+        )
+        total_worked_hours, total_ot_hours, working_days_worked = totals_result.one()
+        
+        # Get leave records for the month
+        leave_result = await db.execute(
+            select(LeaveRequest).filter(
                 LeaveRequest.employee_id == employee.id,
                 LeaveRequest.start_date <= end_date,
                 LeaveRequest.end_date >= start_date,
@@ -3220,15 +3600,10 @@ async def export_employee_monthly_attendance(
             )
         )
         schedules = sched_result.scalars().all()
-        schedule_map = {}
-        comp_off_earned_dates = []
-        comp_off_used_dates = []
-        
-        for sched in schedules:
-            schedule_map[sched.date] = sched
-            # Track comp-off earned days
-            if sched.status == 'comp_off_earned':
-                comp_off_earned_dates.append(sched.date)
+        schedule_map = {s.date: s for s in schedules}
+        # Track comp-off earned days
+        comp_off_earned_schedules = [s for s in schedules if s.status == 'comp_off_earned']
+        comp_off_earned_dates = {s.date for s in comp_off_earned_schedules}
         
         # Get comp-off details for used days
         compoff_details_result = await db.execute(
@@ -3239,8 +3614,7 @@ async def export_employee_monthly_attendance(
             )
         )
         compoff_details = compoff_details_result.scalars().all()
-        for detail in compoff_details:
-            comp_off_used_dates.append(detail.date.date() if hasattr(detail.date, 'date') else detail.date)
+        comp_off_used_dates = {d.date.date() if hasattr(d.date, 'date') else d.date for d in compoff_details}
         
         # Calculate leave dates
         leave_dates = set()
@@ -3250,11 +3624,10 @@ async def export_employee_monthly_attendance(
                 leave_dates.add(current)
                 current += timedelta(days=1)
         
-        # Create workbook with multiple sheets
-        wb = Workbook()
-        wb.remove(wb.active)  # Remove default sheet
+        # Create workbook with multiple sheets (write-only: rows are streamed, never read back)
+        wb = Workbook(write_only=True)
         
-        # Define professional styles
+        # Define professional styles (built once, shared by every cell that uses them)
         header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
         header_font = Font(bold=True, color="FFFFFF", size=11)
         title_font = Font(bold=True, size=14)
@@ -3266,34 +3639,33 @@ async def export_employee_monthly_attendance(
             bottom=Side(style='thin')
         )
         center_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        left_alignment = Alignment(horizontal='left', vertical='center')
+        right_alignment = Alignment(horizontal='right')
         summary_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
         summary_font = Font(bold=True, color="000000")
+        even_fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
         
         # === SHEET 1: SUMMARY ===
         summary_sheet = wb.create_sheet("Summary")
+        for col, width in EMPLOYEE_SUMMARY_WIDTHS:
+            summary_sheet.column_dimensions[col].width = width
         
         # Title
-        summary_sheet['A1'] = f"{employee.first_name} {employee.last_name} - Monthly Report"
-        summary_sheet['A1'].font = title_font
-        summary_sheet.merge_cells('A1:B1')
+        summary_sheet.append([_write_only_cell(summary_sheet, f"{employee.first_name} {employee.last_name} - Monthly Report", font=title_font)])
+        summary_sheet.merged_cells.add('A1:B1')
         
-        summary_sheet['A2'] = f"{calendar.month_name[month]} {year}"
-        summary_sheet['A2'].font = Font(size=11)
-        summary_sheet.merge_cells('A2:B2')
+        summary_sheet.append([_write_only_cell(summary_sheet, f"{calendar.month_name[month]} {year}", font=Font(size=11))])
+        summary_sheet.merged_cells.add('A2:B2')
         
-        summary_sheet['A3'] = f"Employee ID: {employee.employee_id}"
-        summary_sheet['A3'].font = Font(size=10)
+        summary_sheet.append([_write_only_cell(summary_sheet, f"Employee ID: {employee.employee_id}", font=Font(size=10))])
         
-        summary_sheet['A4'] = ""
+        summary_sheet.append([])
         
         # Calculate statistics
-        from dateutil.rrule import rrule, DAILY
-        all_dates = list(rrule(DAILY, dtstart=start_date, until=end_date))
+        all_dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
         
         # Get public holidays
-        from app.holidays_jp import JapaneseCalendar
-        jp_calendar = JapaneseCalendar()
-        jp_holidays_dict = jp_calendar.get_holidays_in_range(start_date, end_date)
+        jp_holidays_dict = _jp_holidays_for(year, month)
         
         # Count statistics
         total_days_in_month = len(all_dates)
@@ -3301,8 +3673,7 @@ async def export_employee_monthly_attendance(
         weekends = 0
         working_days_available = 0
         
-        for current_date in all_dates:
-            date_obj = current_date.date() if hasattr(current_date, 'date') else current_date
+        for date_obj in all_dates:
             is_weekend = date_obj.weekday() >= 5
             is_public_holiday = date_obj in jp_holidays_dict
             
@@ -3312,47 +3683,97 @@ async def export_employee_monthly_attendance(
                 working_days_available += 1
         
         # Count leave types
-        paid_leave_days = 0
-        unpaid_leave_days = 0
+        paid_leave_days = sum(leave_day_count(leave) for leave in leave_records if leave.leave_type.lower() == 'paid')
+        unpaid_leave_days = sum(leave_day_count(leave) for leave in leave_records if leave.leave_type.lower() != 'paid')
         
-        for leave in leave_records:
-            days = (leave.end_date - leave.start_date).days + 1
-            if leave.duration_type and leave.duration_type.startswith('half_day'):
-                days = 0.5
-            
-            if leave.leave_type.lower() == 'paid':
-                paid_leave_days += days
-            else:
-                unpaid_leave_days += days
+        # === SHEET 2: DAILY ATTENDANCE ===
+        ws = wb.create_sheet("Daily Attendance")
         
-        # Count worked hours and night hours
-        total_worked_hours = 0
-        total_ot_hours = 0
+        # Column widths must be set before the first row is streamed
+        for col, width in EMPLOYEE_DAILY_WIDTHS:
+            ws.column_dimensions[col].width = width
+        
+        # Title
+        ws.append([_write_only_cell(ws, f"{employee.first_name} {employee.last_name} - Daily Attendance", font=title_font)])
+        ws.merged_cells.add('A1:M1')
+        
+        ws.append([_write_only_cell(ws, f"{calendar.month_name[month]} {year}", font=Font(size=11))])
+        ws.merged_cells.add('A2:M2')
+        
+        ws.append([])
+        
+        # Headers
+        headers = ['Date', 'Day', 'Assigned Shift', 'Check-In', 'Check-Out', 'Hours Worked', 'Night Hours (After 22:00)', 'Break (min)', 'Overtime Hours', 'Status', 'Comp-Off Earned', 'Comp-Off Used', 'Notes']
+        ws.append([
+            _write_only_cell(ws, header, font=header_font, fill=header_fill, border=border, alignment=center_alignment)
+            for header in headers
+        ])
+        
+        # Data - night hours come from the check-in/out times, so they are totalled while the rows are written
+        row = 5
         total_night_hours = 0
-        working_days_worked = 0
+        
+        # Only comp-off days that have an attendance row can show up in the sheet
+        attendance_date_set = {r.date for r in attendance_records}
+        earned_in_month = comp_off_earned_dates & attendance_date_set
+        used_in_month = comp_off_used_dates & attendance_date_set
         
         for record in attendance_records:
-            if record.worked_hours and record.worked_hours > 0:
-                total_worked_hours += record.worked_hours
-                working_days_worked += 1
-            if record.overtime_hours:
-                total_ot_hours += record.overtime_hours
+            schedule = schedule_map.get(record.date)
+            assigned_shift = '-'
+            if schedule and schedule.start_time and schedule.end_time:
+                assigned_shift = f"{schedule.start_time} - {schedule.end_time}"
+            
+            day_name = WEEKDAY_NAMES[record.date.weekday()]
             
-            # Calculate night hours (after 22:00)
+            # Calculate night hours
             night_hours = calculate_night_hours(record.in_time, record.out_time, night_start_hour=22)
+            
+            # Check if comp-off earned or used on this date
+            earned = record.date in earned_in_month
+            used = record.date in used_in_month
+            comp_off_earned_str = '✓ Yes' if earned else '-'
+            comp_off_used_str = '✓ Yes' if used else '-'
+            
+            values = [
+                record.date,  # written as a date cell by openpyxl
+                day_name,
+                assigned_shift,
+                record.in_time or '-',
+                record.out_time or '-',
+                fmt2(record.worked_hours),
+                fmt2(night_hours),
+                fmti(record.break_minutes),
+                fmt2(record.overtime_hours),
+                record.status or '-',
+                comp_off_earned_str,
+                comp_off_used_str,
+                record.notes or '-',
+            ]
+            # Styles are attached as the cells are built; alternate row colors
+            row_fill = even_fill if row % 2 == 0 else None
+            ws.append([
+                _write_only_cell(
+                    ws, value, fill=row_fill, border=border,
+                    alignment=center_alignment if col in (1, 2, 10, 11, 12) else left_alignment
+                )
+                for col, value in enumerate(values, 1)
+            ])
+            
+            # Add night hours to total
             total_night_hours += night_hours
+            
+            row += 1
         
-        # Summary sections
+        # Summary sections - streamed into the Summary sheet after the daily pass
         row = 5
         
         # ATTENDANCE SUMMARY
-        summary_sheet[f'A{row}'] = "ATTENDANCE SUMMARY"
-        summary_sheet[f'A{row}'].font = section_font
-        summary_sheet[f'A{row}'].fill = summary_fill
-        summary_sheet[f'A{row}'].border = border
-        summary_sheet[f'B{row}'].fill = summary_fill
-        summary_sheet[f'B{row}'].border = border
-        summary_sheet.merge_cells(f'A{row}:B{row}')
+        summary_sheet.append([
+            _write_only_cell(summary_sheet, "ATTENDANCE SUMMARY", font=section_font, fill=summary_fill, border=border),
+            _write_only_cell(summary_sheet, None, fill=summary_fill, border=border),
+        ])
+        summary_sheet.merged_cells.add(f'A{row}:B{row}')
         
         row += 1
         attendance_items = [
@@ -3365,24 +3786,20 @@ async def export_employee_monthly_attendance(
         ]
         
         for label, value in attendance_items:
-            summary_sheet[f'A{row}'] = label
-            summary_sheet[f'B{row}'] = value
-            summary_sheet[f'A{row}'].font = summary_font
-            summary_sheet[f'A{row}'].fill = summary_fill
-            summary_sheet[f'A{row}'].border = border
-            summary_sheet[f'B{row}'].border = border
-            summary_sheet[f'B{row}'].alignment = Alignment(horizontal='right')
+            summary_sheet.append([
+                _write_only_cell(summary_sheet, label, font=summary_font, fill=summary_fill, border=border),
+                _write_only_cell(summary_sheet, value, border=border, alignment=right_alignment),
+            ])
             row += 1
         
         # LEAVE SUMMARY
         row += 1
-        summary_sheet[f'A{row}'] = "LEAVE SUMMARY"
-        summary_sheet[f'A{row}'].font = section_font
-        summary_sheet[f'A{row}'].fill = summary_fill
-        summary_sheet[f'A{row}'].border = border
-        summary_sheet[f'B{row}'].fill = summary_fill
-        summary_sheet[f'B{row}'].border = border
-        summary_sheet.merge_cells(f'A{row}:B{row}')
+        summary_sheet.append([])
+        summary_sheet.append([
+            _write_only_cell(summary_sheet, "LEAVE SUMMARY", font=section_font, fill=summary_fill, border=border),
+            _write_only_cell(summary_sheet, None, fill=summary_fill, border=border),
+        ])
+        summary_sheet.merged_cells.add(f'A{row}:B{row}')
         
         row += 1
         leave_items = [
@@ -3394,26 +3811,22 @@ async def export_employee_monthly_attendance(
         ]
         
         for label, value in leave_items:
-            summary_sheet[f'A{row}'] = label
-            summary_sheet[f'B{row}'] = value
-            summary_sheet[f'A{row}'].font = summary_font
-            summary_sheet[f'A{row}'].fill = summary_fill
-            summary_sheet[f'A{row}'].border = border
-            summary_sheet[f'B{row}'].border = border
-            summary_sheet[f'B{row}'].alignment = Alignment(horizontal='right')
+            summary_sheet.append([
+                _write_only_cell(summary_sheet, label, font=summary_font, fill=summary_fill, border=border),
+                _write_only_cell(summary_sheet, value, border=border, alignment=right_alignment),
+            ])
             row += 1
         
         # COMP-OFF SUMMARY
         row += 1
-        comp_off_earned = len(comp_off_earned_dates)
-        comp_off_used = len(comp_off_used_dates)
-        summary_sheet[f'A{row}'] = "COMP-OFF SUMMARY"
-        summary_sheet[f'A{row}'].font = section_font
-        summary_sheet[f'A{row}'].fill = summary_fill
-        summary_sheet[f'A{row}'].border = border
-        summary_sheet[f'B{row}'].fill = summary_fill
-        summary_sheet[f'B{row}'].border = border
-        summary_sheet.merge_cells(f'A{row}:B{row}')
+        summary_sheet.append([])
+        comp_off_earned = len(comp_off_earned_schedules)
+        comp_off_used = len(compoff_details)
+        summary_sheet.append([
+            _write_only_cell(summary_sheet, "COMP-OFF SUMMARY", font=section_font, fill=summary_fill, border=border),
+            _write_only_cell(summary_sheet, None, fill=summary_fill, border=border),
+        ])
+        summary_sheet.merged_cells.add(f'A{row}:B{row}')
         
         row += 1
         compoff_items = [
@@ -3423,24 +3836,20 @@ async def export_employee_monthly_attendance(
         ]
         
         for label, value in compoff_items:
-            summary_sheet[f'A{row}'] = label
-            summary_sheet[f'B{row}'] = value
-            summary_sheet[f'A{row}'].font = summary_font
-            summary_sheet[f'A{row}'].fill = summary_fill
-            summary_sheet[f'A{row}'].border = border
-            summary_sheet[f'B{row}'].border = border
-            summary_sheet[f'B{row}'].alignment = Alignment(horizontal='right')
+            summary_sheet.append([
+                _write_only_cell(summary_sheet, label, font=summary_font, fill=summary_fill, border=border),
+                _write_only_cell(summary_sheet, value, border=border, alignment=right_alignment),
+            ])
             row += 1
         
         # HOURS SUMMARY
         row += 1
-        summary_sheet[f'A{row}'] = "HOURS SUMMARY"
-        summary_sheet[f'A{row}'].font = section_font
-        summary_sheet[f'A{row}'].fill = summary_fill
-        summary_sheet[f'A{row}'].border = border
-        summary_sheet[f'B{row}'].fill = summary_fill
-        summary_sheet[f'B{row}'].border = border
-        summary_sheet.merge_cells(f'A{row}:B{row}')
+        summary_sheet.append([])
+        summary_sheet.append([
+            _write_only_cell(summary_sheet, "HOURS SUMMARY", font=section_font, fill=summary_fill, border=border),
+            _write_only_cell(summary_sheet, None, fill=summary_fill, border=border),
+        ])
+        summary_sheet.merged_cells.add(f'A{row}:B{row}')
         
         row += 1
         hours_items = [
@@ -3450,132 +3859,19 @@ async def export_employee_monthly_attendance(
         ]
         
         for label, value in hours_items:
-            summary_sheet[f'A{row}'] = label
-            summary_sheet[f'B{row}'] = value
-            summary_sheet[f'A{row}'].font = summary_font
-            summary_sheet[f'A{row}'].fill = summary_fill
-            summary_sheet[f'A{row}'].border = border
-            summary_sheet[f'B{row}'].border = border
-            summary_sheet[f'B{row}'].alignment = Alignment(horizontal='right')
+            summary_sheet.append([
+                _write_only_cell(summary_sheet, label, font=summary_font, fill=summary_fill, border=border),
+                _write_only_cell(summary_sheet, value, border=border, alignment=right_alignment),
+            ])
             row += 1
         
-        summary_sheet.column_dimensions['A'].width = 30
-        summary_sheet.column_dimensions['B'].width = 20
-        
-        # === SHEET 2: DAILY ATTENDANCE ===
-        ws = wb.create_sheet("Daily Attendance")
-        ws.title = "Daily Attendance"
-        
-        # Title
-        ws['A1'] = f"{employee.first_name} {employee.last_name} - Daily Attendance"
-        ws['A1'].font = title_font
-        ws.merge_cells('A1:M1')
-        
-        ws['A2'] = f"{calendar.month_name[month]} {year}"
-        ws['A2'].font = Font(size=11)
-        ws.merge_cells('A2:M2')
-        
-        ws['A3'] = ""
-        
-        # Headers
-        headers = ['Date', 'Day', 'Assigned Shift', 'Check-In', 'Check-Out', 'Hours Worked', 'Night Hours (After 22:00)', 'Break (min)', 'Overtime Hours', 'Status', 'Comp-Off Earned', 'Comp-Off Used', 'Notes']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=4, column=col)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = center_alignment
-            cell.border = border
-        
-        # Data
-        row = 5
-        total_worked_hours = 0
-        total_ot_hours = 0
-        total_night_hours = 0
-        working_days_count = 0
-        comp_off_earned_count = 0
-        comp_off_used_count = 0
-        
-        for record in attendance_records:
-            schedule = schedule_map.get(record.date)
-            assigned_shift = '-'
-            if schedule and schedule.start_time and schedule.end_time:
-                assigned_shift = f"{schedule.start_time} - {schedule.end_time}"
-            
-            day_name = record.date.strftime('%A')
-            
-            # Calculate night hours
-            night_hours = calculate_night_hours(record.in_time, record.out_time, night_start_hour=22)
-            
-            # Check if comp-off earned or used on this date
-            comp_off_earned_str = '✓ Yes' if record.date in comp_off_earned_dates else '-'
-            comp_off_used_str = '✓ Yes' if record.date in comp_off_used_dates else '-'
-            
-            ws.cell(row=row, column=1).value = record.date.isoformat()
-            ws.cell(row=row, column=2).value = day_name
-            ws.cell(row=row, column=3).value = assigned_shift
-            ws.cell(row=row, column=4).value = record.in_time or '-'
-            ws.cell(row=row, column=5).value = record.out_time or '-'
-            ws.cell(row=row, column=6).value = f"{record.worked_hours:.2f}" if record.worked_hours else '-'
-            ws.cell(row=row, column=7).value = f"{night_hours:.2f}" if night_hours > 0 else '-'
-            ws.cell(row=row, column=8).value = f"{record.break_minutes}" if record.break_minutes else '-'
-            ws.cell(row=row, column=9).value = f"{record.overtime_hours:.2f}" if record.overtime_hours else '-'
-            ws.cell(row=row, column=10).value = record.status or '-'
-            ws.cell(row=row, column=11).value = comp_off_earned_str
-            ws.cell(row=row, column=12).value = comp_off_used_str
-            ws.cell(row=row, column=13).value = record.notes or '-'
-            
-            # Apply styling
-            for col in range(1, 14):
-                cell = ws.cell(row=row, column=col)
-                cell.border = border
-                cell.alignment = center_alignment if col in [1, 2, 10, 11, 12] else Alignment(horizontal='left', vertical='center')
-                # Alternate row colors
-                if row % 2 == 0:
-                    cell.fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
-            
-            if record.worked_hours and record.worked_hours > 0:
-                total_worked_hours += record.worked_hours
-                working_days_count += 1
-            
-            if record.overtime_hours:
-                total_ot_hours += record.overtime_hours
-            
-            # Add night hours to total
-            total_night_hours += night_hours
-            
-            if record.date in comp_off_earned_dates:
-                comp_off_earned_count += 1
-            if record.date in comp_off_used_dates:
-                comp_off_used_count += 1
-            
-            row += 1
-        
-        # Adjust column widths
-        ws.column_dimensions['A'].width = 14
-        ws.column_dimensions['B'].width = 14
-        ws.column_dimensions['C'].width = 18
-        ws.column_dimensions['D'].width = 12
-        ws.column_dimensions['E'].width = 12
-        ws.column_dimensions['F'].width = 14
-        ws.column_dimensions['G'].width = 20  # Night Hours column
-        ws.column_dimensions['H'].width = 12
-        ws.column_dimensions['I'].width = 16
-        ws.column_dimensions['J'].width = 12
-        ws.column_dimensions['K'].width = 15
-        ws.column_dimensions['L'].width = 15
-        ws.column_dimensions['M'].width = 20
-        
-        # Set Summary as the active sheet
-        wb.active = summary_sheet
-        
         # Save to bytes
         file_bytes = io.BytesIO()
         wb.save(file_bytes)
         file_bytes.seek(0)
         
         return StreamingResponse(
-            iter([file_bytes.getvalue()]),
+            iter_file_chunks(file_bytes),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={"Content-Disposition": f"attachment; filename={employee.employee_id}_{employee.first_name}_{year}-{month:02d}_attendance.xlsx"}
         )
@@ -3645,17 +3941,12 @@ async def create_leave_request(
     # If requesting paid leave, check if it exceeds the annual entitlement
     if leave_data.leave_type == 'paid':
         # Calculate days for this request
-        days_requested = (leave_data.end_date - leave_data.start_date).days + 1
+        days_requested = leave_day_count(leave_data)
         
         # Get already approved paid leave
-        # Calculate days as: (end_date - start_date) + 1
+        # Calculate days as: (end_date - start_date) + 1, half-day leaves count as 0.5
         approved_paid_result = await db.execute(
-            select(func.sum(
-                func.cast(
-                    LeaveRequest.end_date - LeaveRequest.start_date + 1,
-                    Integer
-                )
-            )).filter(
+            select(func.coalesce(func.cast(func.sum(LEAVE_DAYS_SQL), Float), 0)).filter(
                 LeaveRequest.employee_id == leave_data.employee_id,
                 LeaveRequest.leave_type == 'paid',
                 LeaveRequest.status == LeaveStatus.APPROVED
@@ -3710,18 +4001,13 @@ async def list_leave_requests(
     db: AsyncSession = Depends(get_db)
 ):
     if current_user.user_type == UserType.EMPLOYEE:
-        # Get employee record for current user
-        emp_result = await db.execute(
-            select(Employee).filter(Employee.user_id == current_user.id)
-        )
-        employee = emp_result.scalar_one_or_none()
-        if not employee:
-            return []
-
+        # Join through the employee record of the current user; the joined
+        # employee row also populates LeaveRequest.employee (one round-trip)
         result = await db.execute(
             select(LeaveRequest)
-            .options(selectinload(LeaveRequest.employee))
-            .filter(LeaveRequest.employee_id == employee.id)
+            .join(LeaveRequest.employee)
+            .options(contains_eager(LeaveRequest.employee))
+            .filter(Employee.user_id == current_user.id)
             .order_by(LeaveRequest.start_date)
         )
     elif current_user.user_type == UserType.MANAGER:
@@ -3732,8 +4018,8 @@ async def list_leave_requests(
 
         result = await db.execute(
             select(LeaveRequest)
-            .options(selectinload(LeaveRequest.employee))
-            .join(Employee)
+            .join(LeaveRequest.employee)
+            .options(contains_eager(LeaveRequest.employee))
             .filter(Employee.department_id == manager_dept)
             .order_by(LeaveRequest.start_date)
         )
@@ -3846,7 +4132,6 @@ async def get_employee_leave_statistics(
 ):
     """Get leave statistics for a specific employee (manager only) with monthly breakdown"""
     from datetime import date, datetime
-    from collections import defaultdict
     
     # Get the manager record for current user
     manager_result = await db.execute(select(Manager).filter(Manager.user_id == current_user.id))
@@ -3864,37 +4149,42 @@ async def get_employee_leave_statistics(
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found in your department")
     
-    # Get all approved leave requests for this employee using the integer id
+    # Sum approved leave days per leave type and month in the database
+    leave_month = func.date_trunc(literal_column("'month'"), LeaveRequest.start_date)
     result = await db.execute(
-        select(LeaveRequest)
+        select(
+            LeaveRequest.leave_type,
+            leave_month.label('month'),
+            func.cast(func.sum(LEAVE_DAYS_SQL), Float).label('days')
+        )
         .filter(LeaveRequest.employee_id == employee.id, LeaveRequest.status == LeaveStatus.APPROVED)
-        .order_by(LeaveRequest.start_date)
+        .group_by(LeaveRequest.leave_type, leave_month)
+        .order_by(leave_month)
     )
-    approved_leaves = result.scalars().all()
     
-    # Calculate leave statistics and monthly breakdown
+    # Calculate leave statistics and monthly breakdown (rows arrive in month order)
     taken_paid = 0
     taken_unpaid = 0
-    monthly_breakdown = defaultdict(lambda: {'paid': 0, 'unpaid': 0, 'total': 0})
-    
-    for leave in approved_leaves:
-        days = (leave.end_date - leave.start_date).days + 1
-        # Handle half-day leaves
-        if leave.duration_type and leave.duration_type.startswith('half_day'):
-            days = 0.5
-
-        month_key = leave.start_date.strftime('%Y-%m')  # Format: "2025-01"
-        month_name = leave.start_date.strftime('%B %Y')  # Format: "January 2025"
+    monthly_breakdown = {}
+    
+    for leave_type, leave_month_start, days in result.all():
+        month = monthly_breakdown.get(leave_month_start)
+        if month is None:
+            month = monthly_breakdown[leave_month_start] = {
+                'month': leave_month_start.strftime('%B %Y'),  # Format: "January 2025"
+                'paid': 0,
+                'unpaid': 0,
+                'total': 0
+            }
 
-        if leave.leave_type == 'paid':
+        if leave_type == 'paid':
             taken_paid += days
-            monthly_breakdown[month_key]['paid'] += days
+            month['paid'] += days
         else:
             taken_unpaid += days
-            monthly_breakdown[month_key]['unpaid'] += days
+            month['unpaid'] += days
 
-        monthly_breakdown[month_key]['total'] += days
-        monthly_breakdown[month_key]['month_name'] = month_name
+        month['total'] += days
     
     total_paid_leave = employee.paid_leave_per_year  # Use employee's paid leave setting
     available_paid = max(0, total_paid_leave - taken_paid)
@@ -3912,45 +4202,45 @@ async def get_employee_leave_statistics(
         comp_off_earned = comp_off_tracking.earned_days
         comp_off_used = comp_off_tracking.used_days
     
-    # Get detailed comp-off history
+    # Get the most recent comp-off history entries for display
     compoff_details_result = await db.execute(
         select(CompOffDetail)
         .filter(CompOffDetail.employee_id == employee.id)
         .order_by(CompOffDetail.date.desc())
+        .limit(10)
     )
     compoff_details = compoff_details_result.scalars().all()
     
-    # Group comp-off by month
-    comp_off_monthly = defaultdict(lambda: {'earned': 0, 'used': 0, 'expired': 0})
-    for detail in compoff_details:
-        month_key = detail.earned_month or datetime.utcnow().strftime('%Y-%m')
-        if detail.type == 'earned':
-            comp_off_monthly[month_key]['earned'] += 1
-        elif detail.type == 'used':
-            comp_off_monthly[month_key]['used'] += 1
-        elif detail.type == 'expired':
-            comp_off_monthly[month_key]['expired'] += 1
+    # Group comp-off by month: count (month, type) pairs in the database
+    comp_off_month = func.coalesce(CompOffDetail.earned_month, datetime.utcnow().strftime('%Y-%m'))
+    comp_off_counts_result = await db.execute(
+        select(comp_off_month, CompOffDetail.type, func.count())
+        .filter(
+            CompOffDetail.employee_id == employee.id,
+            CompOffDetail.type.in_(['earned', 'used', 'expired'])
+        )
+        .group_by(comp_off_month, CompOffDetail.type)
+    )
+    comp_off_counts = Counter({
+        (month_key, detail_type): count for month_key, detail_type, count in comp_off_counts_result.all()
+    })
+    comp_off_months = sorted({month_key for month_key, _ in comp_off_counts}, reverse=True)
     
     comp_off_monthly_list = []
-    for month_key in sorted(comp_off_monthly.keys(), reverse=True):
-        data = comp_off_monthly[month_key]
+    for month_key in comp_off_months:
+        earned = comp_off_counts[(month_key, 'earned')]
+        used = comp_off_counts[(month_key, 'used')]
+        expired = comp_off_counts[(month_key, 'expired')]
         comp_off_monthly_list.append({
             'month': month_key,
-            'earned': data['earned'],
-            'used': data['used'],
-            'expired': data['expired'],
-            'available': max(0, data['earned'] - data['used'] - data['expired'])
+            'earned': earned,
+            'used': used,
+            'expired': expired,
+            'available': max(0, earned - used - expired)
         })
     
-    # Convert monthly breakdown to list and sort by month
-    monthly_list = []
-    for month_key in sorted(monthly_breakdown.keys()):
-        monthly_list.append({
-            'month': monthly_breakdown[month_key]['month_name'],
-            'paid': monthly_breakdown[month_key]['paid'],
-            'unpaid': monthly_breakdown[month_key]['unpaid'],
-            'total': monthly_breakdown[month_key]['total']
-        })
+    # Monthly breakdown is already in month order
+    monthly_list = list(monthly_breakdown.values())
     
     return {
         "employee_id": employee.employee_id,
@@ -3963,7 +4253,7 @@ async def get_employee_leave_statistics(
         "comp_off_earned": comp_off_earned,
         "comp_off_used": comp_off_used,
         "comp_off_available": comp_off_available,
-        "comp_off_details": [{"date": d.date.isoformat(), "type": d.type, "month": d.earned_month, "notes": d.notes} for d in compoff_details[:10]],
+        "comp_off_details": [{"date": d.date.isoformat(), "type": d.type, "month": d.earned_month, "notes": d.notes} for d in compoff_details],
         "comp_off_monthly_breakdown": comp_off_monthly_list,
         "monthly_breakdown": monthly_list
     }
@@ -3994,6 +4284,11 @@ async def export_leave_compoff_report(
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found in your department")
     
+    # Recent 3 months window for the attendance sheet
+    from datetime import timedelta
+    today = date.today()
+    three_months_ago = today - timedelta(days=90)
+    
     # Get all approved leave requests for this employee
     leave_result = await db.execute(
         select(LeaveRequest)
@@ -4003,10 +4298,16 @@ async def export_leave_compoff_report(
     approved_leaves = leave_result.scalars().all()
     
     # Get comp-off tracking and details
+    # Only the four balance figures are needed from the tracking row
     comp_off_result = await db.execute(
-        select(CompOffTracking).filter(CompOffTracking.employee_id == employee.id)
+        select(
+            CompOffTracking.earned_days,
+            CompOffTracking.used_days,
+            CompOffTracking.available_days,
+            CompOffTracking.expired_days
+        ).filter(CompOffTracking.employee_id == employee.id)
     )
-    comp_off_tracking = comp_off_result.scalar_one_or_none()
+    comp_off_totals = comp_off_result.one_or_none()
     
     compoff_details_result = await db.execute(
         select(CompOffDetail)
@@ -4015,320 +4316,226 @@ async def export_leave_compoff_report(
     )
     compoff_details = compoff_details_result.scalars().all()
     
-    # Create workbook with two sheets
-    wb = Workbook()
-    wb.remove(wb.active)  # Remove default sheet
+    # One schedule per day for the shift times, preferring the worked shift over a
+    # leave entry on the same date, so each attendance record is listed once
+    day_schedule = (
+        select(Schedule.date, Schedule.start_time, Schedule.end_time)
+        .filter(
+            Schedule.employee_id == employee.id,
+            Schedule.date >= three_months_ago,
+            Schedule.date <= today
+        )
+        .distinct(Schedule.date)
+        .order_by(Schedule.date, Schedule.status != 'scheduled', Schedule.id)
+        .subquery()
+    )
     
-    # Define styles
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
+    # Recent attendance with the schedule of the same day for shift info;
+    # records with neither a check-in nor a check-out aren't days worked
+    att_result = await db.execute(
+        select(Attendance, day_schedule.c.start_time, day_schedule.c.end_time)
+        .outerjoin(day_schedule, day_schedule.c.date == Attendance.date)
+        .filter(
+            Attendance.employee_id == employee.id,
+            Attendance.date >= three_months_ago,
+            Attendance.date <= today,
+            or_(Attendance.in_time.isnot(None), Attendance.out_time.isnot(None))
+        )
+        .order_by(Attendance.date.desc())
     )
-    summary_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-    summary_font = Font(bold=True)
+    attendance_rows = att_result.all()
+    
+    # Create workbook (write-only: rows are streamed, never read back)
+    wb = Workbook(write_only=True)
+    
+    # Data rows only need a border; register it once as a named style
+    wb.add_named_style(NamedStyle(name='bordered', border=REPORT_BORDER))
+    
+    def append_header(ws, headers):
+        ws.append([_write_only_cell(ws, header, **REPORT_HEADER_STYLE) for header in headers])
+    
+    def append_summary(ws, title, items):
+        # Two blank rows, then the section title and the label/value rows
+        ws.append([])
+        ws.append([])
+        ws.append([_write_only_cell(ws, title, font=REPORT_SECTION_FONT)])
+        for label, value in items:
+            ws.append([
+                _write_only_cell(ws, label, **REPORT_SUMMARY_LABEL_STYLE),
+                _write_only_cell(ws, value, **REPORT_SUMMARY_VALUE_STYLE),
+            ])
     
     # === SHEET 1: Leave Requests ===
     ws_leave = wb.create_sheet("Leave Requests")
     
+    # Adjust widths (before any row is written)
+    ws_leave.column_dimensions['A'].width = 12
+    ws_leave.column_dimensions['B'].width = 14
+    ws_leave.column_dimensions['C'].width = 14
+    ws_leave.column_dimensions['D'].width = 14
+    ws_leave.column_dimensions['E'].width = 18
+    ws_leave.column_dimensions['F'].width = 10
+    ws_leave.column_dimensions['G'].width = 12
+    
     # Title
-    ws_leave['A1'] = f"Leave Report - {employee.first_name} {employee.last_name}"
-    ws_leave['A1'].font = Font(bold=True, size=14)
-    ws_leave.merge_cells('A1:F1')
+    ws_leave.append([_write_only_cell(ws_leave, f"Leave Report - {employee.first_name} {employee.last_name}", font=REPORT_TITLE_FONT)])
+    ws_leave.merged_cells.add('A1:F1')
     
-    ws_leave['A2'] = f"Employee ID: {employee.employee_id}"
-    ws_leave['A3'] = f"Generated on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"
+    ws_leave.append([f"Employee ID: {employee.employee_id}"])
+    ws_leave.append([f"Generated on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"])
+    ws_leave.append([])
     
     # Headers
     headers = ['Leave ID', 'Start Date', 'End Date', 'Leave Type', 'Duration Type', 'Days', 'Status']
-    for col, header in enumerate(headers, 1):
-        cell = ws_leave.cell(row=5, column=col)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center')
+    append_header(ws_leave, headers)
 
     # Data - all leaves
-    row = 6
     total_paid = 0
     total_unpaid = 0
 
     for leave in approved_leaves:
-        days = (leave.end_date - leave.start_date).days + 1
-        # Handle half-day leaves
-        if leave.duration_type and leave.duration_type.startswith('half_day'):
-            days = 0.5
-
-        ws_leave.cell(row=row, column=1).value = leave.id
-        ws_leave.cell(row=row, column=2).value = leave.start_date.isoformat()
-        ws_leave.cell(row=row, column=3).value = leave.end_date.isoformat()
-        ws_leave.cell(row=row, column=4).value = leave.leave_type
-        ws_leave.cell(row=row, column=5).value = leave.duration_type or 'full_day'
-        ws_leave.cell(row=row, column=6).value = days
-        ws_leave.cell(row=row, column=7).value = leave.status
-
-        for col in range(1, 8):
-            ws_leave.cell(row=row, column=col).border = border
+        days = leave_day_count(leave)
+
+        ws_leave.append(_write_only_row(ws_leave, [
+            leave.id,
+            leave.start_date.isoformat(),
+            leave.end_date.isoformat(),
+            leave.leave_type,
+            leave.duration_type or 'full_day',
+            days,
+            leave.status,
+        ], 'bordered'))
 
         if leave.leave_type == 'paid':
             total_paid += days
         else:
             total_unpaid += days
-
-        row += 1
     
     # Summary
-    summary_row = row + 2
-    ws_leave.cell(row=summary_row, column=1).value = "SUMMARY"
-    ws_leave.cell(row=summary_row, column=1).font = Font(bold=True, size=12)
-    
-    summary_row += 1
-    summary_items = [
+    append_summary(ws_leave, "SUMMARY", [
         ("Total Paid Leave Days", total_paid),
         ("Total Unpaid Leave Days", total_unpaid),
         ("Total Leave Days", total_paid + total_unpaid),
-    ]
-    
-    for label, value in summary_items:
-        ws_leave.cell(row=summary_row, column=1).value = label
-        ws_leave.cell(row=summary_row, column=1).font = summary_font
-        ws_leave.cell(row=summary_row, column=1).fill = summary_fill
-        ws_leave.cell(row=summary_row, column=1).border = border
-        
-        ws_leave.cell(row=summary_row, column=2).value = value
-        ws_leave.cell(row=summary_row, column=2).fill = summary_fill
-        ws_leave.cell(row=summary_row, column=2).border = border
-        
-        summary_row += 1
-    
-    # Adjust widths
-    ws_leave.column_dimensions['A'].width = 12
-    ws_leave.column_dimensions['B'].width = 14
-    ws_leave.column_dimensions['C'].width = 14
-    ws_leave.column_dimensions['D'].width = 14
-    ws_leave.column_dimensions['E'].width = 18
-    ws_leave.column_dimensions['F'].width = 10
-    ws_leave.column_dimensions['G'].width = 12
+    ])
     
     # === SHEET 2: Comp-Off Details ===
     ws_compoff = wb.create_sheet("Comp-Off Details")
     
+    # Adjust widths (before any row is written)
+    ws_compoff.column_dimensions['A'].width = 14
+    ws_compoff.column_dimensions['B'].width = 12
+    ws_compoff.column_dimensions['C'].width = 12
+    ws_compoff.column_dimensions['D'].width = 12
+    ws_compoff.column_dimensions['E'].width = 20
+    ws_compoff.column_dimensions['F'].width = 10
+    ws_compoff.column_dimensions['G'].width = 10
+    
     # Title
-    ws_compoff['A1'] = f"Comp-Off Report - {employee.first_name} {employee.last_name}"
-    ws_compoff['A1'].font = Font(bold=True, size=14)
-    ws_compoff.merge_cells('A1:G1')
+    ws_compoff.append([_write_only_cell(ws_compoff, f"Comp-Off Report - {employee.first_name} {employee.last_name}", font=REPORT_TITLE_FONT)])
+    ws_compoff.merged_cells.add('A1:G1')
     
-    ws_compoff['A2'] = f"Employee ID: {employee.employee_id}"
-    ws_compoff['A3'] = f"Generated on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"
+    ws_compoff.append([f"Employee ID: {employee.employee_id}"])
+    ws_compoff.append([f"Generated on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"])
+    ws_compoff.append([])
     
     # Headers
     headers_compoff = ['Date', 'Type', 'Month', 'Status', 'Notes', 'Earned', 'Used']
-    for col, header in enumerate(headers_compoff, 1):
-        cell = ws_compoff.cell(row=5, column=col)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center')
+    append_header(ws_compoff, headers_compoff)
     
     # Data - comp-off details
-    row = 6
     for detail in compoff_details:
         earned_str = '✓' if detail.type == 'earned' else ''
         used_str = '✓' if detail.type == 'used' else ''
         
-        ws_compoff.cell(row=row, column=1).value = detail.date.isoformat()
-        ws_compoff.cell(row=row, column=2).value = detail.type
-        ws_compoff.cell(row=row, column=3).value = detail.earned_month or '-'
-        ws_compoff.cell(row=row, column=4).value = 'Expired' if detail.expired_at else detail.type.title()
-        ws_compoff.cell(row=row, column=5).value = detail.notes or '-'
-        ws_compoff.cell(row=row, column=6).value = earned_str
-        ws_compoff.cell(row=row, column=7).value = used_str
-        
-        for col in range(1, 8):
-            ws_compoff.cell(row=row, column=col).border = border
-        
-        row += 1
+        ws_compoff.append(_write_only_row(ws_compoff, [
+            detail.date.isoformat(),
+            detail.type,
+            detail.earned_month or '-',
+            'Expired' if detail.expired_at else detail.type.title(),
+            detail.notes or '-',
+            earned_str,
+            used_str,
+        ], 'bordered'))
     
     # Summary for comp-off
-    summary_row = row + 2
-    ws_compoff.cell(row=summary_row, column=1).value = "COMP-OFF SUMMARY"
-    ws_compoff.cell(row=summary_row, column=1).font = Font(bold=True, size=12)
-    
-    summary_row += 1
-    comp_off_earned = comp_off_tracking.earned_days if comp_off_tracking else 0
-    comp_off_used = comp_off_tracking.used_days if comp_off_tracking else 0
-    comp_off_available = comp_off_tracking.available_days if comp_off_tracking else 0
-    comp_off_expired = comp_off_tracking.expired_days if comp_off_tracking else 0
+    comp_off_earned, comp_off_used, comp_off_available, comp_off_expired = comp_off_totals or (0, 0, 0, 0)
     
-    summary_items_compoff = [
+    append_summary(ws_compoff, "COMP-OFF SUMMARY", [
         ("Total Comp-Off Earned", comp_off_earned),
         ("Total Comp-Off Used", comp_off_used),
         ("Comp-Off Available", comp_off_available),
         ("Comp-Off Expired", comp_off_expired),
-    ]
-    
-    for label, value in summary_items_compoff:
-        ws_compoff.cell(row=summary_row, column=1).value = label
-        ws_compoff.cell(row=summary_row, column=1).font = summary_font
-        ws_compoff.cell(row=summary_row, column=1).fill = summary_fill
-        ws_compoff.cell(row=summary_row, column=1).border = border
-        
-        ws_compoff.cell(row=summary_row, column=2).value = value
-        ws_compoff.cell(row=summary_row, column=2).fill = summary_fill
-        ws_compoff.cell(row=summary_row, column=2).border = border
-        
-        summary_row += 1
-    
-    # Adjust widths
-    ws_compoff.column_dimensions['A'].width = 14
-    ws_compoff.column_dimensions['B'].width = 12
-    ws_compoff.column_dimensions['C'].width = 12
-    ws_compoff.column_dimensions['D'].width = 12
-    ws_compoff.column_dimensions['E'].width = 20
-    ws_compoff.column_dimensions['F'].width = 10
-    ws_compoff.column_dimensions['G'].width = 10
+    ])
     
     # === SHEET 3: Attendance Summary ===
     ws_attendance = wb.create_sheet("Attendance Summary")
     
-    # Get recent 3 months of attendance data
-    from datetime import timedelta
-    today = date.today()
-    three_months_ago = today - timedelta(days=90)
-    
-    att_result = await db.execute(
-        select(Attendance)
-        .filter(
-            Attendance.employee_id == employee.id,
-            Attendance.date >= three_months_ago,
-            Attendance.date <= today
-        )
-        .order_by(Attendance.date.desc())
-    )
-    attendance_records = att_result.scalars().all()
-    
-    # Get schedules for shift info
-    sched_result = await db.execute(
-        select(Schedule)
-        .filter(
-            Schedule.employee_id == employee.id,
-            Schedule.date >= three_months_ago,
-            Schedule.date <= today
-        )
-        .order_by(Schedule.date.desc())
-    )
-    schedules = sched_result.scalars().all()
-    schedule_map = {s.date: s for s in schedules}
+    # Adjust widths (before any row is written)
+    ws_attendance.column_dimensions['A'].width = 14
+    ws_attendance.column_dimensions['B'].width = 12
+    ws_attendance.column_dimensions['C'].width = 16
+    ws_attendance.column_dimensions['D'].width = 12
+    ws_attendance.column_dimensions['E'].width = 12
+    ws_attendance.column_dimensions['F'].width = 14
+    ws_attendance.column_dimensions['G'].width = 16
+    ws_attendance.column_dimensions['H'].width = 12
     
     # Title
-    ws_attendance['A1'] = f"Attendance Summary - {employee.first_name} {employee.last_name}"
-    ws_attendance['A1'].font = Font(bold=True, size=14)
-    ws_attendance.merge_cells('A1:H1')
+    ws_attendance.append([_write_only_cell(ws_attendance, f"Attendance Summary - {employee.first_name} {employee.last_name}", font=REPORT_TITLE_FONT)])
+    ws_attendance.merged_cells.add('A1:H1')
     
-    ws_attendance['A2'] = f"Employee ID: {employee.employee_id}"
-    ws_attendance['A3'] = f"Period: Last 90 Days | Generated on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"
+    ws_attendance.append([f"Employee ID: {employee.employee_id}"])
+    ws_attendance.append([f"Period: Last 90 Days | Generated on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"])
+    ws_attendance.append([])
     
     # Headers
     headers_att = ['Date', 'Day', 'Shift Time', 'Check-In', 'Check-Out', 'Hours Worked', 'Overtime Hours', 'Status']
-    for col, header in enumerate(headers_att, 1):
-        cell = ws_attendance.cell(row=5, column=col)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center')
+    append_header(ws_attendance, headers_att)
     
     # Data - attendance records
-    row = 6
+    # Hours worked for every record in one pass, so the writer loop only formats
+    worked_hours = [span_hours(att_rec.in_time, att_rec.out_time) for att_rec, _, _ in attendance_rows]
+    total_work_hours = sum(hours for hours in worked_hours if hours is not None)
     total_ot_hours = 0
-    total_work_hours = 0
     
-    for att_rec in attendance_records:
-        schedule = schedule_map.get(att_rec.date)
+    for (att_rec, shift_start, shift_end), hours in zip(attendance_rows, worked_hours):
         shift_str = '-'
-        if schedule and schedule.start_time and schedule.end_time:
-            shift_str = f"{schedule.start_time} - {schedule.end_time}"
+        if shift_start and shift_end:
+            shift_str = f"{shift_start} - {shift_end}"
         
-        # Calculate hours worked
-        hours_worked = '-'
-        if att_rec.in_time and att_rec.out_time:
-            try:
-                in_h, in_m = map(int, str(att_rec.in_time).split(':')[:2])
-                out_h, out_m = map(int, str(att_rec.out_time).split(':')[:2])
-                in_decimal = in_h + in_m / 60
-                out_decimal = out_h + out_m / 60
-                hours = out_decimal - in_decimal if out_decimal > in_decimal else 24 - in_decimal + out_decimal
-                hours_worked = f"{hours:.2f}"
-                total_work_hours += hours
-            except:
-                pass
+        hours_worked = f"{hours:.2f}" if hours is not None else '-'
         
         ot_hours = att_rec.overtime_hours or 0
         total_ot_hours += ot_hours
         
         # Get day name
-        day_name = att_rec.date.strftime('%A')
-        
-        ws_attendance.cell(row=row, column=1).value = att_rec.date.isoformat()
-        ws_attendance.cell(row=row, column=2).value = day_name
-        ws_attendance.cell(row=row, column=3).value = shift_str
-        ws_attendance.cell(row=row, column=4).value = att_rec.in_time or '-'
-        ws_attendance.cell(row=row, column=5).value = att_rec.out_time or '-'
-        ws_attendance.cell(row=row, column=6).value = hours_worked
-        ws_attendance.cell(row=row, column=7).value = f"{ot_hours:.2f}" if ot_hours > 0 else '-'
-        ws_attendance.cell(row=row, column=8).value = 'Present'
-        
-        for col in range(1, 9):
-            ws_attendance.cell(row=row, column=col).border = border
-        
-        row += 1
+        day_name = WEEKDAY_NAMES[att_rec.date.weekday()]
+        
+        ws_attendance.append(_write_only_row(ws_attendance, [
+            att_rec.date.isoformat(),
+            day_name,
+            shift_str,
+            att_rec.in_time or '-',
+            att_rec.out_time or '-',
+            hours_worked,
+            fmt2(ot_hours),
+            'Present',
+        ], 'bordered'))
     
     # Summary stats
-    summary_row = row + 2
-    ws_attendance.cell(row=summary_row, column=1).value = "ATTENDANCE SUMMARY"
-    ws_attendance.cell(row=summary_row, column=1).font = Font(bold=True, size=12)
-    
-    summary_row += 1
-    summary_items_att = [
-        ("Total Days Worked", len(attendance_records)),
+    append_summary(ws_attendance, "ATTENDANCE SUMMARY", [
+        ("Total Days Worked", len(attendance_rows)),
         ("Total Work Hours", f"{total_work_hours:.2f}"),
         ("Total Overtime Hours", f"{total_ot_hours:.2f}"),
-    ]
-    
-    for label, value in summary_items_att:
-        ws_attendance.cell(row=summary_row, column=1).value = label
-        ws_attendance.cell(row=summary_row, column=1).font = summary_font
-        ws_attendance.cell(row=summary_row, column=1).fill = summary_fill
-        ws_attendance.cell(row=summary_row, column=1).border = border
-        
-        ws_attendance.cell(row=summary_row, column=2).value = value
-        ws_attendance.cell(row=summary_row, column=2).fill = summary_fill
-        ws_attendance.cell(row=summary_row, column=2).border = border
-        
-        summary_row += 1
-    
-    # Adjust widths
-    ws_attendance.column_dimensions['A'].width = 14
-    ws_attendance.column_dimensions['B'].width = 12
-    ws_attendance.column_dimensions['C'].width = 16
-    ws_attendance.column_dimensions['D'].width = 12
-    ws_attendance.column_dimensions['E'].width = 12
-    ws_attendance.column_dimensions['F'].width = 14
-    ws_attendance.column_dimensions['G'].width = 16
-    ws_attendance.column_dimensions['H'].width = 12
+    ])
     
-    # Save to bytes
+    # Save to bytes; the report is bounded to 90 days, so send it in one
+    # write (with a Content-Length) rather than as a chunked stream
     file_bytes = io.BytesIO()
     wb.save(file_bytes)
-    file_bytes.seek(0)
     
-    return StreamingResponse(
-        iter([file_bytes.getvalue()]),
+    return Response(
+        content=file_bytes.getvalue(),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": f"attachment; filename=leave_compoff_report_{employee_id}_{date.today().isoformat()}.xlsx"}
     )
@@ -4342,7 +4549,13 @@ async def approve_leave(
     current_user: User = Depends(require_manager),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(select(LeaveRequest).filter(LeaveRequest.id == leave_id))
+    # Load the employee (for schedule entries) and their user (for the
+    # notification) in the same round-trip as the leave request
+    result = await db.execute(
+        select(LeaveRequest)
+        .options(joinedload(LeaveRequest.employee).joinedload(Employee.user))
+        .filter(LeaveRequest.id == leave_id)
+    )
     leave_request = result.scalar_one_or_none()
 
     if not leave_request:
@@ -4360,27 +4573,28 @@ async def approve_leave(
     leave_request.reviewed_at = datetime.utcnow()
     leave_request.review_notes = approval_data.review_notes
 
-    # Get employee for creating schedule entries
-    emp_result = await db.execute(
-        select(Employee).filter(Employee.id == leave_request.employee_id)
-    )
-    employee = emp_result.scalar_one_or_none()
+    employee = leave_request.employee
 
     # Create schedule entries for all leave types
     if employee:
         # Handle regular paid/unpaid leaves
         if leave_request.leave_type in ['paid', 'unpaid']:
+            # Dates in the leave range that already have a schedule
+            existing_result = await db.execute(
+                select(Schedule.date).filter(
+                    Schedule.employee_id == employee.id,
+                    Schedule.date >= leave_request.start_date,
+                    Schedule.date <= leave_request.end_date,
+                    Schedule.status != 'cancelled'
+                )
+            )
+            existing_dates = set(existing_result.scalars().all())
+            
+            new_schedules = []
             current_date = leave_request.start_date
             while current_date <= leave_request.end_date:
                 # Check if schedule already exists for this date
-                existing = await db.execute(
-                    select(Schedule).filter(
-                        Schedule.employee_id == employee.id,
-                        Schedule.date == current_date,
-                        Schedule.status != 'cancelled'
-                    )
-                )
-                if not existing.scalar_one_or_none():
+                if current_date not in existing_dates:
                     # Determine status and times based on duration_type
                     if leave_request.duration_type and leave_request.duration_type.startswith('half_day'):
                         if leave_request.duration_type == 'half_day_morning':
@@ -4409,35 +4623,31 @@ async def approve_leave(
                         status=status,
                         notes=notes
                     )
-                    db.add(leave_schedule)
+                    new_schedules.append(leave_schedule)
 
                 current_date += timedelta(days=1)
+            
+            db.add_all(new_schedules)
 
     # If comp-off leave, validate expiry and create schedule entries
     if leave_request.leave_type == 'comp_off' and employee:
         # Check if comp-off is expired
         check_date = datetime.utcnow()
 
-        # Validate each day can use comp-off from that month
-        current_check_date = leave_request.start_date
-        while current_check_date <= leave_request.end_date:
-            month_str = current_check_date.strftime("%Y-%m")
-            current_month_str = check_date.date().strftime("%Y-%m")
-
-            # Check if requesting to use comp-off from a past month
-            if month_str < current_month_str:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Cannot use comp-off from {month_str}. Comp-off expires at end of the month earned."
-                )
-
-            current_check_date += timedelta(days=1)
+        # Comp-off can't be used from a past month; the earliest day of the
+        # leave is its start date, so only that month needs checking
+        start_month = leave_request.start_date.replace(day=1)
+        if start_month < check_date.date().replace(day=1):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot use comp-off from {start_month:%Y-%m}. Comp-off expires at end of the month earned."
+            )
 
         # ===== NO CONSTRAINT VALIDATION for comp-off usage =====
         # comp_off_taken is NOT a work shift - it replaces a scheduled shift
         # Therefore it does NOT count toward 5-shifts-per-week limit
         # No validation needed - just create the comp-off schedule
-        print(f"[DEBUG] ✓ Creating comp-off_taken schedule (no constraint validation needed)", flush=True)
+        logger.debug("✓ Creating comp-off_taken schedule (no constraint validation needed)")
 
         # ===== FETCH SHIFT TIMES FOR COMP-OFF DAYS =====
         # Get the employee's actual scheduled shift for the leave date
@@ -4449,29 +4659,46 @@ async def approve_leave(
         # For multi-day leaves, we'll determine shift times per day in the loop below
         # For now, get a default shift to use for all days
         
-        # First, try to get a scheduled shift ON the leave start date itself
-        same_day_result = await db.execute(
+        # Load every schedule in the leave range once; the per-day shift lookups
+        # and the cleanup of replaced schedules below work from these. The
+        # cascaded check-in/attendance rows come along so deleting a schedule
+        # doesn't lazy-load them one schedule at a time
+        range_result = await db.execute(
             select(Schedule)
+            .options(selectinload(Schedule.check_in), selectinload(Schedule.attendance))
             .filter(
                 Schedule.employee_id == employee.id,
-                Schedule.date == leave_request.start_date,
-                Schedule.status == 'scheduled'
+                Schedule.date >= leave_request.start_date,
+                Schedule.date <= leave_request.end_date,
+                Schedule.status != 'cancelled'
             )
-            .limit(1)
         )
-        same_day_schedule = same_day_result.scalar_one_or_none()
+        range_schedules = range_result.scalars().all()
+        
+        scheduled_by_date = {}
+        schedules_by_date = defaultdict(list)
+        for sched in range_schedules:
+            schedules_by_date[sched.date].append(sched)
+            if sched.status == 'scheduled':
+                scheduled_by_date.setdefault(sched.date, sched)
+        
+        shift_ids = {sched.shift_id for sched in scheduled_by_date.values() if sched.shift_id}
+        shifts_by_id = {}
+        if shift_ids:
+            shifts_result = await db.execute(select(Shift).filter(Shift.id.in_(shift_ids)))
+            shifts_by_id = {shift.id: shift for shift in shifts_result.scalars().all()}
+        
+        # First, try to get a scheduled shift ON the leave start date itself
+        same_day_schedule = scheduled_by_date.get(leave_request.start_date)
         
         if same_day_schedule and same_day_schedule.shift_id:
             # Use the shift from the same-day schedule
-            shift_result = await db.execute(
-                select(Shift).filter(Shift.id == same_day_schedule.shift_id)
-            )
-            shift = shift_result.scalar_one_or_none()
+            shift = shifts_by_id.get(same_day_schedule.shift_id)
             if shift:
                 shift_start_time = shift.start_time
                 shift_end_time = shift.end_time
                 shift_id = shift.id
-                print(f"[DEBUG] ✓ Fetched shift times from same-day schedule: {shift.name} ({shift_start_time}-{shift_end_time})", flush=True)
+                logger.debug("✓ Fetched shift times from same-day schedule: %s (%s-%s)", shift.name, shift_start_time, shift_end_time)
         
         # Fallback 1: if no same-day schedule, try to get the most recent scheduled shift before the leave
         if not shift_id:
@@ -4497,7 +4724,7 @@ async def approve_leave(
                     shift_start_time = shift.start_time
                     shift_end_time = shift.end_time
                     shift_id = shift.id
-                    print(f"[DEBUG] ✓ Fetched shift times from recent schedule: {shift.name} ({shift_start_time}-{shift_end_time})", flush=True)
+                    logger.debug("✓ Fetched shift times from recent schedule: %s (%s-%s)", shift.name, shift_start_time, shift_end_time)
         
         # Fallback 2: if no recent schedule, try to get the next scheduled shift (employee's ongoing pattern)
         if not shift_id:
@@ -4522,7 +4749,7 @@ async def approve_leave(
                     shift_start_time = shift.start_time
                     shift_end_time = shift.end_time
                     shift_id = shift.id
-                    print(f"[DEBUG] ✓ Fetched shift times from next schedule: {shift.name} ({shift_start_time}-{shift_end_time})", flush=True)
+                    logger.debug("✓ Fetched shift times from next schedule: %s (%s-%s)", shift.name, shift_start_time, shift_end_time)
         
         # Fallback 3: if no recent or next schedule, get the highest priority shift for their role
         if not shift_id and employee.role_id:
@@ -4538,11 +4765,12 @@ async def approve_leave(
                 shift_start_time = shift.start_time
                 shift_end_time = shift.end_time
                 shift_id = shift.id
-                print(f"[DEBUG] ✓ Fallback: Fetched highest priority shift: {shift.name} ({shift_start_time}-{shift_end_time}, priority={shift.priority})", flush=True)
+                logger.debug("✓ Fallback: Fetched highest priority shift: %s (%s-%s, priority=%s)", shift.name, shift_start_time, shift_end_time, shift.priority)
             else:
-                print(f"[DEBUG] ⚠ No active shifts found for role {employee.role_id}", flush=True)
+                logger.debug("⚠ No active shifts found for role %s", employee.role_id)
 
         # Create schedule entry for each day of comp-off
+        new_schedules = []
         current_date = leave_request.start_date
         comp_off_days = 0
         while current_date <= leave_request.end_date:
@@ -4552,44 +4780,23 @@ async def approve_leave(
             day_shift_id = shift_id
             
             # Check if there's a scheduled shift ON THIS DAY (overrides the default)
-            same_day_result = await db.execute(
-                select(Schedule)
-                .filter(
-                    Schedule.employee_id == employee.id,
-                    Schedule.date == current_date,
-                    Schedule.status == 'scheduled'
-                )
-                .limit(1)
-            )
-            same_day_schedule = same_day_result.scalar_one_or_none()
+            same_day_schedule = scheduled_by_date.get(current_date)
             
             if same_day_schedule and same_day_schedule.shift_id:
                 # Use the shift from this day's schedule
-                shift_result = await db.execute(
-                    select(Shift).filter(Shift.id == same_day_schedule.shift_id)
-                )
-                shift = shift_result.scalar_one_or_none()
+                shift = shifts_by_id.get(same_day_schedule.shift_id)
                 if shift:
                     day_shift_start_time = shift.start_time
                     day_shift_end_time = shift.end_time
                     day_shift_id = shift.id
-                    print(f"[DEBUG] Day {current_date}: Using same-day shift: {shift.name} ({day_shift_start_time}-{day_shift_end_time})", flush=True)
+                    logger.debug("Day %s: Using same-day shift: %s (%s-%s)", current_date, shift.name, day_shift_start_time, day_shift_end_time)
             else:
-                print(f"[DEBUG] Day {current_date}: No same-day scheduled shift found, using default: {day_shift_start_time}-{day_shift_end_time}", flush=True)
+                logger.debug("Day %s: No same-day scheduled shift found, using default: %s-%s", current_date, day_shift_start_time, day_shift_end_time)
             
             # Delete any existing non-comp_off_taken schedules for this date to avoid conflicts
-            existing_result = await db.execute(
-                select(Schedule).filter(
-                    Schedule.employee_id == employee.id,
-                    Schedule.date == current_date,
-                    Schedule.status != 'comp_off_taken',
-                    Schedule.status != 'cancelled'
-                )
-            )
-            existing_schedules = existing_result.scalars().all()
-            
-            if existing_schedules:
-                for sched in existing_schedules:
+            # (ORM deletes so the attendance/check-in cascades still apply)
+            for sched in schedules_by_date.get(current_date, []):
+                if sched.status != 'comp_off_taken':
                     await db.delete(sched)
             
             # Create comp-off usage schedule (taking comp-off as leave)
@@ -4605,10 +4812,12 @@ async def approve_leave(
                 status="comp_off_taken",  # Status for comp-off taken (using earned comp-off)
                 notes=f"Comp-Off Taken: {leave_request.reason or 'Using earned comp-off'}"
             )
-            db.add(comp_off_schedule)
+            new_schedules.append(comp_off_schedule)
             comp_off_days += 1
 
             current_date += timedelta(days=1)
+        
+        db.add_all(new_schedules)
 
         # Update comp-off tracking: increment used_days and create detail records
         tracking_result = await db.execute(
@@ -4621,26 +4830,24 @@ async def approve_leave(
             tracking.available_days = tracking.earned_days - tracking.used_days
             tracking.updated_at = datetime.utcnow()
 
-            # Create detail records for each used day
+            # Create detail records for each used day (one executemany INSERT)
+            new_details = []
             current_date = leave_request.start_date
             while current_date <= leave_request.end_date:
-                month_str = current_date.strftime("%Y-%m")
-                detail = CompOffDetail(
-                    employee_id=employee.id,
-                    tracking_id=tracking.id,
-                    type='used',
-                    date=current_date,
-                    earned_month=month_str,
-                    notes=f"Used on {current_date.strftime('%Y-%m-%d')}"
-                )
-                db.add(detail)
+                date_str = current_date.isoformat()
+                new_details.append({
+                    'employee_id': employee.id,
+                    'tracking_id': tracking.id,
+                    'type': 'used',
+                    'date': current_date,
+                    'earned_month': date_str[:7],
+                    'notes': f"Used on {date_str}"
+                })
                 current_date += timedelta(days=1)
+            await db.execute(insert(CompOffDetail), new_details)
 
     # Get employee user for notification
-    emp_user_result = await db.execute(
-        select(User).filter(User.id == employee.user_id)
-    )
-    emp_user = emp_user_result.scalar_one_or_none()
+    emp_user = employee.user if employee else None
     
     # Create notification for employee
     if emp_user:
@@ -4780,13 +4987,13 @@ async def create_comp_off_request(
     existing_shift = shift_result.scalar_one_or_none()
 
     if existing_shift:
-        print(f"[DEBUG] ✗ Comp-off blocked: {target_employee_id} has shift on {comp_off_data.comp_off_date} with status '{existing_shift.status}'", flush=True)
+        logger.debug("✗ Comp-off blocked: %s has shift on %s with status '%s'", target_employee_id, comp_off_data.comp_off_date, existing_shift.status)
         raise HTTPException(
             status_code=400,
             detail=f"Shift already assigned on this date. Cannot apply comp-off when a work shift is scheduled."
         )
 
-    print(f"[DEBUG] ✓ Comp-off allowed: {target_employee_id} has no shift on {comp_off_data.comp_off_date}", flush=True)
+    logger.debug("✓ Comp-off allowed: %s has no shift on %s", target_employee_id, comp_off_data.comp_off_date)
 
     # Create comp-off request (pending approval for employees, can be auto-approved for managers)
     comp_off_request = CompOffRequest(
@@ -4860,11 +5067,13 @@ async def list_comp_off_requests(
             return []
 
         # Get all comp-off requests from employees in this manager's department
+        # (IN-subquery on employee ids rather than a join; employees are
+        # loaded separately by selectinload anyway)
+        dept_employee_ids = select(Employee.id).filter(Employee.department_id == manager.department_id)
         result = await db.execute(
             select(CompOffRequest)
             .options(selectinload(CompOffRequest.employee))
-            .join(Employee, CompOffRequest.employee_id == Employee.id)
-            .filter(Employee.department_id == manager.department_id)
+            .filter(CompOffRequest.employee_id.in_(dept_employee_ids))
             .order_by(CompOffRequest.comp_off_date.desc())
         )
     else:
@@ -4893,17 +5102,7 @@ async def get_comp_off_tracking(
         raise HTTPException(status_code=404, detail="Employee not found")
     
     # Get or create comp-off tracking record
-    tracking_result = await db.execute(
-        select(CompOffTracking).filter(CompOffTracking.employee_id == employee.id)
-    )
-    tracking = tracking_result.scalar_one_or_none()
-    
-    if not tracking:
-        # Create new tracking record
-        tracking = CompOffTracking(employee_id=employee.id)
-        db.add(tracking)
-        await db.commit()
-        await db.refresh(tracking)
+    tracking = await get_or_create_comp_off_tracking(db, employee.id)
     
     return tracking
 
@@ -4923,17 +5122,7 @@ async def get_comp_off_balance(
         raise HTTPException(status_code=404, detail="Employee not found")
     
     # Get or create comp-off tracking record
-    tracking_result = await db.execute(
-        select(CompOffTracking).filter(CompOffTracking.employee_id == employee.id)
-    )
-    tracking = tracking_result.scalar_one_or_none()
-    
-    if not tracking:
-        # Create new tracking record
-        tracking = CompOffTracking(employee_id=employee.id)
-        db.add(tracking)
-        await db.commit()
-        await db.refresh(tracking)
+    tracking = await get_or_create_comp_off_tracking(db, employee.id)
     
     return {"balance": tracking.available_days}
 
@@ -4952,27 +5141,28 @@ async def get_monthly_comp_off_breakdown(
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
     
-    # Get all comp-off details for this employee
+    # Details are read-only here, so fetch plain column rows rather than
+    # hydrating CompOffDetail objects
     details_result = await db.execute(
-        select(CompOffDetail).filter(
+        select(*CompOffDetail.__table__.columns).filter(
             CompOffDetail.employee_id == employee.id
         ).order_by(CompOffDetail.date.desc())
     )
-    details = details_result.scalars().all()
     
-    # Group by month
+    # Group by month (details without an earned month count towards the current one);
+    # the counts are tallied from the same rows that are listed, so they always agree
+    current_month_str = datetime.utcnow().strftime("%Y-%m")
     monthly_data = defaultdict(lambda: {"earned": 0, "used": 0, "expired": 0, "details": []})
+    type_counts = Counter()
     
-    for detail in details:
-        month = detail.earned_month or datetime.utcnow().strftime("%Y-%m")
-        monthly_data[month]["details"].append(detail)
-        
-        if detail.type == 'earned':
-            monthly_data[month]["earned"] += 1
-        elif detail.type == 'used':
-            monthly_data[month]["used"] += 1
-        elif detail.type == 'expired':
-            monthly_data[month]["expired"] += 1
+    for detail in details_result.mappings():
+        month_str = detail['earned_month'] or current_month_str
+        monthly_data[month_str]["details"].append(dict(detail))
+        type_counts[(month_str, detail['type'])] += 1
+    
+    for (month_str, detail_type), count in type_counts.items():
+        if detail_type in ('earned', 'used', 'expired'):
+            monthly_data[month_str][detail_type] = count
     
     # Calculate available for each month
     result = []
@@ -5038,40 +5228,87 @@ async def validate_comp_off_available(
             "month": month
         }
     
-    # Get details for the requested month
-    details_result = await db.execute(
-        select(CompOffDetail).filter(
-            and_(
-                CompOffDetail.employee_id == employee.id,
-                CompOffDetail.earned_month == month,
-                CompOffDetail.type.in_(['earned'])
-            )
-        )
-    )
-    earned_records = details_result.scalars().all()
-    
-    # Count used in same month
-    used_result = await db.execute(
-        select(CompOffDetail).filter(
+    # Count earned and used details for the requested month in one query
+    counts_result = await db.execute(
+        select(CompOffDetail.type, func.count())
+        .filter(
             and_(
                 CompOffDetail.employee_id == employee.id,
                 CompOffDetail.earned_month == month,
-                CompOffDetail.type.in_(['used'])
+                CompOffDetail.type.in_(['earned', 'used'])
             )
         )
+        .group_by(CompOffDetail.type)
     )
-    used_records = used_result.scalars().all()
+    counts = dict(counts_result.all())
+    earned = counts.get('earned', 0)
+    used = counts.get('used', 0)
     
-    available = len(earned_records) - len(used_records)
+    available = earned - used
     
     return {
         "available": max(0, available),
-        "earned": len(earned_records),
-        "used": len(used_records),
+        "earned": earned,
+        "used": used,
         "month": month,
         "is_current_month": requested_date.month == current_date.month and requested_date.year == current_date.year
     }
 
+async def find_comp_off_shifts(comp_off_ids: list[int], db: AsyncSession) -> dict:
+    """Pick the shift shown on each comp-off day.
+
+    Priority: 1) Shift ON the comp-off date, 2) Recent shift before, 3) Next shift after,
+    4) Role's highest priority. Resolved with correlated subqueries, so any number of
+    requests takes two queries. Returns {comp_off_id: (shift_id, start_time, end_time)},
+    all three None when nothing matches.
+    """
+    def scheduled_shift(date_filter, ordering=None):
+        query = select(Schedule.shift_id).where(
+            Schedule.employee_id == CompOffRequest.employee_id,
+            date_filter,
+            Schedule.status == 'scheduled'
+        )
+        if ordering is not None:
+            query = query.order_by(ordering)
+        return query.limit(1).correlate(CompOffRequest).scalar_subquery()
+    
+    role_shift = (
+        select(Shift.id)
+        .where(Shift.role_id == Employee.role_id, Shift.is_active == True)
+        .order_by(Shift.priority.desc())
+        .limit(1)
+        .correlate(Employee)
+        .scalar_subquery()
+    )
+    candidates_result = await db.execute(
+        select(
+            CompOffRequest.id,
+            scheduled_shift(Schedule.date == CompOffRequest.comp_off_date),
+            scheduled_shift(Schedule.date < CompOffRequest.comp_off_date, Schedule.date.desc()),
+            scheduled_shift(Schedule.date > CompOffRequest.comp_off_date, Schedule.date.asc()),
+            role_shift
+        )
+        .join(Employee, Employee.id == CompOffRequest.employee_id)
+        .where(CompOffRequest.id.in_(comp_off_ids))
+    )
+    # First non-empty candidate: same-day, recent, next, then the role's highest priority
+    picked = {
+        comp_off_id: next((shift_id for shift_id in candidates if shift_id), None)
+        for comp_off_id, *candidates in candidates_result.all()
+    }
+    
+    shifts_result = await db.execute(
+        select(Shift.id, Shift.start_time, Shift.end_time)
+        .where(Shift.id.in_({shift_id for shift_id in picked.values() if shift_id}))
+    )
+    shift_times = {shift_id: (start_time, end_time) for shift_id, start_time, end_time in shifts_result.all()}
+    
+    return {
+        comp_off_id: (shift_id, *shift_times[shift_id]) if shift_id in shift_times else (None, None, None)
+        for comp_off_id, shift_id in picked.items()
+    }
+
+
 @app.post("/manager/approve-comp-off/{comp_off_id}")
 async def approve_comp_off(
     comp_off_id: int,
@@ -5106,145 +5343,25 @@ async def approve_comp_off(
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
     
+    # One timestamp for the review, tracking and audit fields below
+    now = datetime.utcnow()
+    
     # Approve the comp-off request
     comp_off.status = LeaveStatus.APPROVED
     comp_off.manager_id = manager.id
-    comp_off.reviewed_at = datetime.utcnow()
+    comp_off.reviewed_at = now
     comp_off.review_notes = approval_data.review_notes
     
-    print(f"[DEBUG] ✓ Approving comp-off for {employee.first_name} on {comp_off.comp_off_date}", flush=True)
+    logger.debug("✓ Approving comp-off for %s on %s", employee.first_name, comp_off.comp_off_date)
     
     # For comp-off taken: fetch the shift times from the employee's role/shifts
     # (comp_off_taken replaces the scheduled shift, but display shift times for reference)
-    
-    # ===== FETCH SHIFT TIMES FOR COMP-OFF DAY =====
-    # Get the employee's actual scheduled shift for the comp-off date
-    # Priority: 1) Shift ON the comp-off date, 2) Recent shift before, 3) Next shift after, 4) Role's highest priority
-    shift_start_time = None
-    shift_end_time = None
-    shift_id = None
-    
-    # First, try to get a scheduled shift ON the comp-off date itself
-    same_day_result = await db.execute(
-        select(Schedule)
-        .filter(
-            Schedule.employee_id == employee.id,
-            Schedule.date == comp_off.comp_off_date,
-            Schedule.status == 'scheduled'
-        )
-        .limit(1)
-    )
-    same_day_schedule = same_day_result.scalar_one_or_none()
-    
-    if same_day_schedule and same_day_schedule.shift_id:
-        # Use the shift from the same-day schedule (the one being replaced by comp-off)
-        shift_result = await db.execute(
-            select(Shift).filter(Shift.id == same_day_schedule.shift_id)
-        )
-        shift = shift_result.scalar_one_or_none()
-        if shift:
-            shift_start_time = shift.start_time
-            shift_end_time = shift.end_time
-            shift_id = shift.id
-            print(f"[DEBUG] ✓ Fetched shift times from same-day schedule: {shift.name} ({shift_start_time}-{shift_end_time})", flush=True)
-    
-    # Fallback 1: if no same-day schedule, try to get the most recent scheduled shift before the comp-off date
-    if not shift_id:
-        recent_sched_result = await db.execute(
-            select(Schedule)
-            .filter(
-                Schedule.employee_id == employee.id,
-                Schedule.date < comp_off.comp_off_date,
-                Schedule.status == 'scheduled'
-            )
-            .order_by(Schedule.date.desc())
-            .limit(1)
-        )
-        recent_schedule = recent_sched_result.scalar_one_or_none()
-        
-        if recent_schedule and recent_schedule.shift_id:
-            # Use the shift from the employee's recent schedule
-            shift_result = await db.execute(
-                select(Shift).filter(Shift.id == recent_schedule.shift_id)
-            )
-            shift = shift_result.scalar_one_or_none()
-            if shift:
-                shift_start_time = shift.start_time
-                shift_end_time = shift.end_time
-                shift_id = shift.id
-                print(f"[DEBUG] ✓ Fetched shift times from recent schedule: {shift.name} ({shift_start_time}-{shift_end_time})", flush=True)
-    
-    # Fallback 2: if no recent schedule, try to get the next scheduled shift (employee's ongoing pattern)
-    if not shift_id:
-        next_sched_result = await db.execute(
-            select(Schedule)
-            .filter(
-                Schedule.employee_id == employee.id,
-                Schedule.date > comp_off.comp_off_date,
-                Schedule.status == 'scheduled'
-            )
-            .order_by(Schedule.date.asc())
-            .limit(1)
-        )
-        next_schedule = next_sched_result.scalar_one_or_none()
-        
-        if next_schedule and next_schedule.shift_id:
-            shift_result = await db.execute(
-                select(Shift).filter(Shift.id == next_schedule.shift_id)
-            )
-            shift = shift_result.scalar_one_or_none()
-            if shift:
-                shift_start_time = shift.start_time
-                shift_end_time = shift.end_time
-                shift_id = shift.id
-                print(f"[DEBUG] ✓ Fetched shift times from next schedule: {shift.name} ({shift_start_time}-{shift_end_time})", flush=True)
-    
-    # Fallback 3: if no recent or next schedule, get the highest priority shift for their role
-    if not shift_id and employee.role_id:
-        shift_result = await db.execute(
-            select(Shift)
-            .filter(Shift.role_id == employee.role_id, Shift.is_active == True)
-            .order_by(Shift.priority.desc())
-            .limit(1)
-        )
-        shift = shift_result.scalar_one_or_none()
-        
-        if shift:
-            shift_start_time = shift.start_time
-            shift_end_time = shift.end_time
-            shift_id = shift.id
-            print(f"[DEBUG] ✓ Fallback: Fetched highest priority shift: {shift.name} ({shift_start_time}-{shift_end_time}, priority={shift.priority})", flush=True)
-        else:
-            print(f"[DEBUG] ⚠ No active shifts found for role {employee.role_id}", flush=True)
+    comp_off_shifts = await find_comp_off_shifts([comp_off.id], db)
+    shift_id, shift_start_time, shift_end_time = comp_off_shifts[comp_off.id]
     
     # ===== CONSTRAINT VALIDATION for comp-off taken =====
-    # Validate 5-shifts-per-week and consecutive-shifts constraints
-    # These constraints should NOT apply to comp-off_taken since it replaces a shift
-    # and doesn't add to the workload
-    
-    # Check one more time if there's a scheduled shift ON THIS DAY (for accuracy)
-    same_day_result = await db.execute(
-        select(Schedule)
-        .filter(
-            Schedule.employee_id == employee.id,
-            Schedule.date == comp_off.comp_off_date,
-            Schedule.status == 'scheduled'
-        )
-        .limit(1)
-    )
-    same_day_schedule = same_day_result.scalar_one_or_none()
-    
-    if same_day_schedule and same_day_schedule.shift_id:
-        # Use the shift from this day's schedule (the one being replaced by comp-off)
-        shift_result = await db.execute(
-            select(Shift).filter(Shift.id == same_day_schedule.shift_id)
-        )
-        shift = shift_result.scalar_one_or_none()
-        if shift:
-            shift_start_time = shift.start_time
-            shift_end_time = shift.end_time
-            shift_id = shift.id
-            print(f"[DEBUG] Found same-day shift: {shift.name} ({shift_start_time}-{shift_end_time})", flush=True)
+    # 5-shifts-per-week and consecutive-shifts constraints should NOT apply to
+    # comp-off_taken since it replaces a shift and doesn't add to the workload
     
     # Delete any existing schedules for this date (to avoid duplicates)
     # This includes both regular schedules and any existing comp_off_taken schedules
@@ -5258,7 +5375,7 @@ async def approve_comp_off(
     )
     await db.flush()  # Flush the deletes
     
-    print(f"[DEBUG] Deleted all existing schedules for {employee.first_name} on {comp_off.comp_off_date}")
+    logger.debug("Deleted all existing schedules for %s on %s", employee.first_name, comp_off.comp_off_date)
     
     # Create a schedule entry for the comp-off day
     # Status: comp_off_taken means employee is using earned comp-off instead of working
@@ -5280,38 +5397,33 @@ async def approve_comp_off(
     
     comp_off.schedule_id = new_schedule.id
     
-    # Get current month-year for earned_date tracking
-    current_date = datetime.utcnow()
-    earned_month = current_date.strftime("%Y-%m")
-    
-    # Update comp-off tracking: increment earned_days (employee earned a comp-off day)
+    # Update comp-off tracking: increment earned_days (employee earned a comp-off day).
+    # A single upsert creates the row on first earn and increments it atomically
+    # otherwise, so concurrent approvals can't race on the unique employee_id
+    tracking_insert = pg_insert(CompOffTracking).values(
+        employee_id=employee.id,
+        earned_days=1,
+        used_days=0,
+        available_days=1,
+        earned_date=now
+    )
     tracking_result = await db.execute(
-        select(CompOffTracking).filter(CompOffTracking.employee_id == employee.id)
+        tracking_insert.on_conflict_do_update(
+            index_elements=['employee_id'],
+            set_={
+                'earned_days': CompOffTracking.earned_days + 1,
+                'earned_date': tracking_insert.excluded.earned_date,
+                'available_days': CompOffTracking.earned_days + 1 - CompOffTracking.used_days,
+                'updated_at': now
+            }
+        ).returning(CompOffTracking.id)
     )
-    tracking = tracking_result.scalar_one_or_none()
-    
-    if tracking:
-        tracking.earned_days += 1
-        tracking.earned_date = current_date
-        tracking.available_days = tracking.earned_days - tracking.used_days
-        tracking.updated_at = datetime.utcnow()
-        db.add(tracking)
-    else:
-        # Create tracking if it doesn't exist
-        tracking = CompOffTracking(
-            employee_id=employee.id,
-            earned_days=1,
-            used_days=0,
-            available_days=1,
-            earned_date=current_date
-        )
-        db.add(tracking)
-        await db.flush()  # Flush to get ID
+    tracking_id = tracking_result.scalar_one()
     
     # Add detail record for audit trail (earned)
     detail = CompOffDetail(
         employee_id=employee.id,
-        tracking_id=tracking.id,
+        tracking_id=tracking_id,
         type='earned',
         date=comp_off.comp_off_date,
         earned_month=comp_off.comp_off_date.strftime("%Y-%m"),
@@ -5338,10 +5450,145 @@ async def approve_comp_off(
             db=db
         )
     
-    # Commit all changes
+    # Commit all changes
+    await db.commit()
+    
+    return {"message": "Comp-off approved successfully"}
+
+
+@app.post("/manager/approve-comp-offs")
+async def approve_comp_offs(
+    approval_data: CompOffBulkApproval,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db)
+):
+    """Manager approves several pending comp-off requests in one transaction.
+
+    Same effect as calling approve-comp-off for each id, but the schedules,
+    tracking counters, audit details and notifications are written in bulk.
+    """
+    manager_result = await db.execute(
+        select(Manager).filter(Manager.user_id == current_user.id)
+    )
+    manager = manager_result.scalar_one_or_none()
+    
+    if not manager:
+        raise HTTPException(status_code=403, detail="User is not a manager")
+    
+    # Only pending requests from the manager's own department
+    result = await db.execute(
+        select(CompOffRequest)
+        .join(CompOffRequest.employee)
+        .options(contains_eager(CompOffRequest.employee))
+        .where(
+            CompOffRequest.id.in_(approval_data.ids),
+            CompOffRequest.status == LeaveStatus.PENDING,
+            Employee.department_id == manager.department_id
+        )
+        .order_by(CompOffRequest.id)
+    )
+    comp_offs = result.scalars().all()
+    
+    if not comp_offs:
+        raise HTTPException(status_code=404, detail="No pending comp-off requests found")
+    
+    now = datetime.utcnow()
+    
+    comp_off_shifts = await find_comp_off_shifts([c.id for c in comp_offs], db)
+    
+    # One comp_off_taken schedule per (employee, date): as with approving the requests
+    # one by one, a later request for the same day replaces the earlier one's schedule
+    schedule_rows = {}
+    for comp_off in comp_offs:
+        employee = comp_off.employee
+        shift_id, shift_start_time, shift_end_time = comp_off_shifts[comp_off.id]
+        schedule_rows[(employee.id, comp_off.comp_off_date)] = {
+            'department_id': employee.department_id,
+            'employee_id': employee.id,
+            'role_id': employee.role_id,
+            'shift_id': shift_id,
+            'date': comp_off.comp_off_date,
+            'start_time': shift_start_time,
+            'end_time': shift_end_time,
+            'status': 'comp_off_taken',
+            'notes': f"Comp-Off Usage: {comp_off.reason or 'Worked on non-shift day'}"
+        }
+    
+    # Replace whatever was scheduled on each comp-off day
+    await db.execute(
+        delete(Schedule).where(
+            tuple_(Schedule.employee_id, Schedule.date).in_(list(schedule_rows))
+        )
+    )
+    schedule_ids = (await db.scalars(
+        insert(Schedule).returning(Schedule.id, sort_by_parameter_order=True),
+        list(schedule_rows.values())
+    )).all()
+    schedule_id_by_day = dict(zip(schedule_rows, schedule_ids))
+    
+    for comp_off in comp_offs:
+        comp_off.status = LeaveStatus.APPROVED
+        comp_off.manager_id = manager.id
+        comp_off.reviewed_at = now
+        comp_off.review_notes = approval_data.review_notes
+        comp_off.schedule_id = schedule_id_by_day[(comp_off.employee_id, comp_off.comp_off_date)]
+    
+    # One upsert for all employees' tracking rows, incremented by their approval count
+    earned_counts = Counter(c.employee_id for c in comp_offs)
+    tracking_insert = pg_insert(CompOffTracking).values([
+        {
+            'employee_id': employee_id,
+            'earned_days': count,
+            'used_days': 0,
+            'available_days': count,
+            'earned_date': now
+        }
+        for employee_id, count in earned_counts.items()
+    ])
+    tracking_result = await db.execute(
+        tracking_insert.on_conflict_do_update(
+            index_elements=['employee_id'],
+            set_={
+                'earned_days': CompOffTracking.earned_days + tracking_insert.excluded.earned_days,
+                'earned_date': tracking_insert.excluded.earned_date,
+                'available_days': CompOffTracking.earned_days + tracking_insert.excluded.earned_days - CompOffTracking.used_days,
+                'updated_at': now
+            }
+        ).returning(CompOffTracking.employee_id, CompOffTracking.id)
+    )
+    tracking_ids = dict(tracking_result.all())
+    
+    # Audit trail (earned) for every approval in a single INSERT
+    await db.execute(insert(CompOffDetail), [
+        {
+            'employee_id': comp_off.employee_id,
+            'tracking_id': tracking_ids[comp_off.employee_id],
+            'type': 'earned',
+            'date': comp_off.comp_off_date,
+            'earned_month': comp_off.comp_off_date.strftime("%Y-%m"),
+            'notes': f"Earned by working on {comp_off.comp_off_date.strftime('%Y-%m-%d')}"
+        }
+        for comp_off in comp_offs
+    ])
+    
+    await create_notifications([
+        {
+            'user_id': comp_off.employee.user_id,
+            'title': "✅ Comp-Off Usage Approved",
+            'message': f"Your comp-off usage request for {comp_off.comp_off_date} has been approved.",
+            'notification_type': "comp_off_approved",
+            'related_id': comp_off.id
+        }
+        for comp_off in comp_offs
+        if comp_off.employee.user_id
+    ], db=db)
+    
     await db.commit()
     
-    return {"message": "Comp-off approved successfully"}
+    return {
+        "message": f"{len(comp_offs)} comp-off request(s) approved successfully",
+        "approved_ids": [c.id for c in comp_offs]
+    }
 
 
 @app.post("/manager/reject-comp-off/{comp_off_id}")
@@ -5417,35 +5664,36 @@ async def get_comp_off_statistics(
     if current_user.user_type != UserType.EMPLOYEE:
         raise HTTPException(status_code=403, detail="Only employees can access their comp-off statistics")
     
-    # Get employee record
-    emp_result = await db.execute(
-        select(Employee).filter(Employee.user_id == current_user.id)
+    # Get employee name and comp-off tracking together (tracking may not exist yet)
+    result = await db.execute(
+        select(
+            Employee.first_name,
+            Employee.last_name,
+            CompOffTracking.earned_days,
+            CompOffTracking.used_days
+        )
+        .outerjoin(CompOffTracking, CompOffTracking.employee_id == Employee.id)
+        .filter(Employee.user_id == current_user.id)
     )
-    employee = emp_result.scalar_one_or_none()
+    row = result.first()
     
-    if not employee:
+    if not row:
         raise HTTPException(status_code=404, detail="Employee not found")
     
-    # Get comp-off tracking
-    tracking_result = await db.execute(
-        select(CompOffTracking).filter(CompOffTracking.employee_id == employee.id)
-    )
-    tracking = tracking_result.scalar_one_or_none()
-    
-    if not tracking:
+    if row.earned_days is None:
         # Return default if no tracking exists
         return {
             "earned_days": 0,
             "used_days": 0,
             "available_days": 0,
-            "employee_name": f"{employee.first_name} {employee.last_name}"
+            "employee_name": f"{row.first_name} {row.last_name}"
         }
     
     return {
-        "earned_days": tracking.earned_days,
-        "used_days": tracking.used_days,
-        "available_days": max(0, tracking.earned_days - tracking.used_days),
-        "employee_name": f"{employee.first_name} {employee.last_name}"
+        "earned_days": row.earned_days,
+        "used_days": row.used_days,
+        "available_days": max(0, row.earned_days - row.used_days),
+        "employee_name": f"{row.first_name} {row.last_name}"
     }
 
 
@@ -5458,14 +5706,19 @@ async def export_comp_off_report(
     if current_user.user_type != UserType.EMPLOYEE:
         raise HTTPException(status_code=403, detail="Only employees can download their comp-off reports")
     
-    # Get employee
+    # Get employee with department (shown in the report header) and comp-off
+    # tracking in one query; tracking may not exist yet
     emp_result = await db.execute(
-        select(Employee).filter(Employee.user_id == current_user.id)
+        select(Employee, CompOffTracking)
+        .options(joinedload(Employee.department))
+        .outerjoin(CompOffTracking, CompOffTracking.employee_id == Employee.id)
+        .filter(Employee.user_id == current_user.id)
     )
-    employee = emp_result.scalar_one_or_none()
+    emp_row = emp_result.first()
     
-    if not employee:
+    if not emp_row:
         raise HTTPException(status_code=404, detail="Employee not found")
+    employee, tracking = emp_row
     
     # Get comp-off requests for this employee
     comp_off_result = await db.execute(
@@ -5475,16 +5728,9 @@ async def export_comp_off_report(
     )
     comp_off_requests = comp_off_result.scalars().all()
     
-    # Get comp-off tracking
-    tracking_result = await db.execute(
-        select(CompOffTracking).filter(CompOffTracking.employee_id == employee.id)
-    )
-    tracking = tracking_result.scalar_one_or_none()
-    
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Comp-Off Report"
+    # Create workbook (write-only: rows are streamed top to bottom)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Comp-Off Report")
     
     # Header styles
     header_fill = PatternFill(start_color="10b981", end_color="10b981", fill_type="solid")
@@ -5496,63 +5742,54 @@ async def export_comp_off_report(
         bottom=Side(style='thin')
     )
     
+    # Column widths must be set before the first row is written
+    ws.column_dimensions['A'].width = 15
+    ws.column_dimensions['B'].width = 15
+    ws.column_dimensions['C'].width = 20
+    ws.column_dimensions['D'].width = 20
+    ws.column_dimensions['E'].width = 15
+    
     # Title
-    ws['A1'] = f"Comp-Off Report"
-    ws['A1'].font = Font(bold=True, size=14)
-    ws.merge_cells('A1:E1')
+    ws.append([_write_only_cell(ws, "Comp-Off Report", font=Font(bold=True, size=14))])
+    ws.merged_cells.add('A1:E1')
+    ws.append([])
     
     # Employee Info
-    ws['A3'] = "Employee Name:"
-    ws['B3'] = f"{employee.first_name} {employee.last_name}"
-    ws['D3'] = "Employee ID:"
-    ws['E3'] = employee.employee_id
-    
-    ws['A4'] = "Department:"
-    ws['B4'] = employee.department.name if employee.department else "N/A"
-    ws['D4'] = "Report Date:"
-    ws['E4'] = datetime.now().strftime('%Y-%m-%d')
+    ws.append(["Employee Name:", f"{employee.first_name} {employee.last_name}", None, "Employee ID:", employee.employee_id])
+    ws.append([
+        "Department:", employee.department.name if employee.department else "N/A", None,
+        "Report Date:", datetime.now().strftime('%Y-%m-%d')
+    ])
+    ws.append([])
     
     # Summary Section
-    ws['A6'] = "Comp-Off Summary"
-    ws['A6'].font = Font(bold=True, size=12)
-    
-    ws['A7'] = "Earned Days:"
-    ws['B7'] = tracking.earned_days if tracking else 0
-    ws['D7'] = "Used Days:"
-    ws['E7'] = tracking.used_days if tracking else 0
-    
-    ws['A8'] = "Available Days:"
-    ws['B8'] = max(0, (tracking.earned_days - tracking.used_days)) if tracking else 0
+    ws.append([_write_only_cell(ws, "Comp-Off Summary", font=Font(bold=True, size=12))])
+    ws.append([
+        "Earned Days:", tracking.earned_days if tracking else 0, None,
+        "Used Days:", tracking.used_days if tracking else 0
+    ])
+    ws.append(["Available Days:", max(0, (tracking.earned_days - tracking.used_days)) if tracking else 0])
+    ws.append([])
     
     # Detailed Records
-    ws['A10'] = "Comp-Off Requests"
-    ws['A10'].font = Font(bold=True, size=11)
+    ws.append([_write_only_cell(ws, "Comp-Off Requests", font=Font(bold=True, size=11))])
     
     # Headers
     headers = ['Date', 'Status', 'Reason', 'Manager Notes', 'Request Date']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=11, column=col)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = border
+    ws.append([
+        _write_only_cell(ws, header, font=header_font, fill=header_fill, border=border)
+        for header in headers
+    ])
     
     # Data rows
-    row = 12
     for request in comp_off_requests:
-        ws.cell(row=row, column=1).value = request.comp_off_date.strftime('%Y-%m-%d')
-        ws.cell(row=row, column=2).value = request.status.upper()
-        ws.cell(row=row, column=3).value = request.reason or '-'
-        ws.cell(row=row, column=4).value = request.review_notes or '-'
-        ws.cell(row=row, column=5).value = request.created_at.strftime('%Y-%m-%d')
-        row += 1
-    
-    # Adjust column widths
-    ws.column_dimensions['A'].width = 15
-    ws.column_dimensions['B'].width = 15
-    ws.column_dimensions['C'].width = 20
-    ws.column_dimensions['D'].width = 20
-    ws.column_dimensions['E'].width = 15
+        ws.append([
+            request.comp_off_date.strftime('%Y-%m-%d'),
+            request.status.upper(),
+            request.reason or '-',
+            request.review_notes or '-',
+            request.created_at.strftime('%Y-%m-%d'),
+        ])
     
     # Create file
     file_bytes = io.BytesIO()
@@ -5560,7 +5797,7 @@ async def export_comp_off_report(
     file_bytes.seek(0)
     
     return StreamingResponse(
-        iter([file_bytes.getvalue()]),
+        iter_file_chunks(file_bytes),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": f"attachment; filename=comp_off_report_{employee.employee_id}_{datetime.now().strftime('%Y%m%d')}.xlsx"}
     )
@@ -5573,9 +5810,17 @@ async def send_message(
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
+    # The sender is the current user; only the recipient needs loading (often
+    # already in the identity map), so no refresh is needed after the commit
+    recipient = None
+    if message_data.recipient_id is not None:
+        recipient = await db.get(User, message_data.recipient_id)
+        if not recipient:
+            raise HTTPException(status_code=404, detail="Recipient not found")
+    
     message = Message(
-        sender_id=current_user.id,
-        recipient_id=message_data.recipient_id,
+        sender=current_user,
+        recipient=recipient,
         department_id=message_data.department_id,
         subject=message_data.subject,
         message=message_data.message
@@ -5584,9 +5829,6 @@ async def send_message(
     db.add(message)
     await db.commit()
     
-    # Refresh and eagerly load relationships
-    await db.refresh(message, ['sender', 'recipient'])
-    
     return message
 
 
@@ -5596,12 +5838,13 @@ async def get_messages(
     db: AsyncSession = Depends(get_db)
 ):
     # Get messages: either sent by user, sent to user, or sent to their department
-    user_department_id = await get_user_department(current_user, db)
+    # (the department is resolved inside the same query as a scalar subquery)
+    department_query = user_department_query(current_user)
     department_filters = []
-    if user_department_id is not None:
+    if department_query is not None:
         department_filters.append(
             and_(
-                Message.department_id == user_department_id,
+                Message.department_id == department_query.scalar_subquery(),
                 Message.is_deleted_by_recipient == False
             )
         )
@@ -5659,14 +5902,22 @@ async def mark_message_as_read(
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(select(Message).filter(Message.id == message_id))
-    message = result.scalar_one_or_none()
+    # Fetch the message and the user's department in one round-trip
+    department_query = user_department_query(current_user)
+    result = await db.execute(
+        select(
+            Message,
+            department_query.scalar_subquery() if department_query is not None else null()
+        ).filter(Message.id == message_id)
+    )
+    row = result.one_or_none()
     
-    if not message:
+    if not row:
         raise HTTPException(status_code=404, detail="Message not found")
     
+    message, user_department_id = row
+    
     # Only the recipient or department can mark as read
-    user_department_id = await get_user_department(current_user, db)
     if message.recipient_id != current_user.id and message.department_id != user_department_id:
         raise HTTPException(status_code=403, detail="Cannot mark this message as read")
     
@@ -5704,6 +5955,18 @@ async def create_notification(
         return None
 
 
+async def create_notifications(notifications: list, db: AsyncSession = None):
+    """Create several notifications in one flush; each item holds create_notification()'s arguments"""
+    try:
+        created = [Notification(**notification, is_read=False) for notification in notifications]
+        db.add_all(created)
+        await db.flush()
+        return created
+    except Exception as e:
+        print(f"Error creating notifications: {e}")
+        return []
+
+
 # Notifications
 @app.get("/notifications", response_model=List[NotificationResponse])
 async def get_notifications(
@@ -5726,18 +5989,20 @@ async def mark_notification_read(
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
+    # Ownership check and update in one statement; no row means not found
     result = await db.execute(
-        select(Notification).filter(
+        update(Notification)
+        .where(
             Notification.id == notification_id,
             Notification.user_id == current_user.id
         )
+        .values(is_read=True)
+        .returning(Notification.id)
     )
-    notification = result.scalar_one_or_none()
 
-    if not notification:
+    if result.first() is None:
         raise HTTPException(status_code=404, detail="Notification not found")
 
-    notification.is_read = True
     await db.commit()
 
     return {"message": "Notification marked as read"}
@@ -5749,19 +6014,18 @@ async def mark_all_notifications_read(
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(
-        select(Notification).filter(
+        update(Notification)
+        .where(
             Notification.user_id == current_user.id,
             Notification.is_read == False
         )
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
     )
-    notifications = result.scalars().all()
-
-    for notification in notifications:
-        notification.is_read = True
 
     await db.commit()
 
-    return {"message": f"{len(notifications)} notifications marked as read"}
+    return {"message": f"{result.rowcount} notifications marked as read"}
 
 
 @app.delete("/notifications/{notification_id}")
@@ -5770,18 +6034,19 @@ async def delete_notification(
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
+    # Ownership check and delete in one statement; no row means not found
     result = await db.execute(
-        select(Notification).filter(
+        delete(Notification)
+        .where(
             Notification.id == notification_id,
             Notification.user_id == current_user.id
         )
+        .returning(Notification.id)
     )
-    notification = result.scalar_one_or_none()
 
-    if not notification:
+    if result.first() is None:
         raise HTTPException(status_code=404, detail="Notification not found")
 
-    await db.delete(notification)
     await db.commit()
 
     return {"message": "Notification deleted"}
@@ -5791,42 +6056,38 @@ async def delete_notification(
 @app.get("/calendar/holidays")
 async def get_holidays(
     year: int,
-    month: int
+    month: int,
+    request: Request
 ):
     """Get Japanese holidays for a specific month (public endpoint)"""
     from calendar import monthrange
     
-    # Get the calendar days for the month
-    _, days_in_month = monthrange(year, month)
-    start_date = date(year, month, 1)
-    end_date = date(year, month, days_in_month)
-    
-    # Get all holidays and weekends
-    holidays = {}
-    current_date = start_date
-    
-    while current_date <= end_date:
-        is_weekend = current_date.weekday() >= 5  # Saturday=5, Sunday=6
-        is_holiday = is_japanese_holiday(current_date)
-        holiday_name = get_japanese_holiday_name(current_date) if is_holiday else None
-        
-        if is_weekend or is_holiday:
-            holidays[current_date.isoformat()] = {
-                'date': current_date.isoformat(),
-                'day_name': current_date.strftime('%A'),
-                'is_weekend': is_weekend,
-                'is_holiday': is_holiday,
-                'holiday_name': holiday_name,
-                'type': 'holiday' if is_holiday else 'weekend'
-            }
-        
-        current_date += timedelta(days=1)
+    # Enumerate the month's days up front: weekdays follow from the first
+    # day's, and the month's holidays are looked up once
+    first_weekday, days_in_month = monthrange(year, month)
+    days = [date(year, month, day) for day in range(1, days_in_month + 1)]
+    weekdays = [(first_weekday + offset) % 7 for offset in range(days_in_month)]
+    month_holidays = _jp_holidays_for(year, month)
+    
+    # Get all holidays and weekends (Saturday=5, Sunday=6)
+    holidays = {
+        day.isoformat(): {
+            'date': day,
+            'day_name': WEEKDAY_NAMES[weekday],
+            'is_weekend': weekday >= 5,
+            'is_holiday': day in month_holidays,
+            'holiday_name': month_holidays.get(day),
+            'type': 'holiday' if day in month_holidays else 'weekend'
+        }
+        for day, weekday in zip(days, weekdays)
+        if weekday >= 5 or day in month_holidays
+    }
     
-    return {
+    return cacheable_json_response(request, {
         'year': year,
         'month': month,
         'holidays': holidays
-    }
+    })
 
 
 @app.get("/calendar/week-validation/{employee_id}")
@@ -5898,7 +6159,7 @@ async def check_week_validation(
         'current_schedule': [
             {
                 'date': s.date.isoformat(),
-                'day_name': s.date.strftime('%A'),
+                'day_name': WEEKDAY_NAMES[s.date.weekday()],
                 'shift_time': f"{s.start_time} - {s.end_time}",
                 'status': s.status
             }
@@ -5911,7 +6172,8 @@ async def check_week_validation(
 async def get_week_info(
     year: int,
     month: int,
-    week_number: int
+    week_number: int,
+    request: Request
 ):
     """Get detailed week information including holidays and required shifts (public endpoint)"""
     # Calculate week start (Monday of the specified week)
@@ -5923,12 +6185,12 @@ async def get_week_info(
     
     week_info = jp_calendar.get_week_info(week_start)
     
-    return {
-        'week_start': week_info['week_start'].isoformat(),
-        'week_end': week_info['week_end'].isoformat(),
+    return cacheable_json_response(request, {
+        'week_start': week_info['week_start'],
+        'week_end': week_info['week_end'],
         'days': [
             {
-                'date': day['date'].isoformat(),
+                'date': day['date'],
                 'day_name': day['day_name'],
                 'is_weekend': day['is_weekend'],
                 'is_holiday': day['is_holiday'],
@@ -5941,7 +6203,7 @@ async def get_week_info(
         'holiday_count': week_info['holiday_count'],
         'weekday_holiday_count': week_info['weekday_holiday_count'],
         'required_shifts': week_info['required_shifts']
-    }
+    })
 
 
 @app.get("/schedules", response_model=List[ScheduleResponse])
@@ -5951,21 +6213,15 @@ async def get_schedules(
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    query = select(Schedule).options(
-        selectinload(Schedule.employee).selectinload(Employee.user),
-        selectinload(Schedule.role)
-    )
+    # ScheduleResponse only carries scalar columns, so no relationships are loaded
+    query = select(Schedule)
 
     if current_user.user_type == UserType.EMPLOYEE:
-        # Get employee by user_id
-        emp_result = await db.execute(
-            select(Employee).filter(Employee.user_id == current_user.id)
+        # Scope to the user's own employee row via a join; no separate lookup,
+        # and a user without an employee record simply gets no rows
+        query = query.join(Employee, Employee.id == Schedule.employee_id).filter(
+            Employee.user_id == current_user.id
         )
-        employee = emp_result.scalar_one_or_none()
-        if employee:
-            query = query.filter(Schedule.employee_id == employee.id)
-        else:
-            return []
     elif current_user.user_type == UserType.MANAGER:
         manager_dept = await get_manager_department(current_user, db)
         if manager_dept:
@@ -6042,23 +6298,24 @@ async def create_schedule(
             raise HTTPException(status_code=403, detail="Can only schedule employees in your department")
 
     # Get the shift/role to calculate hours
-    try:
-        start_h, start_m = map(int, schedule_data.start_time.split(':'))
-        end_h, end_m = map(int, schedule_data.end_time.split(':'))
-        start_decimal = start_h + start_m / 60
-        end_decimal = end_h + end_m / 60
-        shift_hours = end_decimal - start_decimal if end_decimal > start_decimal else 24 - start_decimal + end_decimal
-    except:
-        shift_hours = 0
+    shift_hours = span_hours(schedule_data.start_time, schedule_data.end_time) or 0
+    
+    # Load the employee's schedules for the week once; the constraint checks and
+    # the daily/weekly hour totals below all work from these rows
+    week_schedules = await load_week_schedules(schedule_data.employee_id, schedule_data.date, db)
     
     # ===== CONSTRAINT VALIDATION =====
     # CONSTRAINT 1: Check 5 shifts per week limit
-    is_valid, error_msg = await validate_5_shifts_per_week(schedule_data.employee_id, schedule_data.date, db)
+    is_valid, error_msg = await validate_5_shifts_per_week(
+        schedule_data.employee_id, schedule_data.date, db, week_schedules=week_schedules
+    )
     if not is_valid:
         raise HTTPException(status_code=400, detail=error_msg)
     
     # CONSTRAINT 2: Check 5 consecutive shifts limit
-    is_valid, error_msg = await validate_consecutive_shifts_limit(schedule_data.employee_id, schedule_data.date, db)
+    is_valid, error_msg = await validate_consecutive_shifts_limit(
+        schedule_data.employee_id, schedule_data.date, db, week_schedules=week_schedules
+    )
     if not is_valid:
         raise HTTPException(status_code=400, detail=error_msg)
     
@@ -6073,26 +6330,15 @@ async def create_schedule(
         daily_overtime = True
         overtime_hours = shift_hours - 8
     
-    # Check existing schedules for the day to see if daily limit exceeded
-    existing_result = await db.execute(
-        select(Schedule).filter(
-            Schedule.employee_id == schedule_data.employee_id,
-            Schedule.date == schedule_data.date
-        )
-    )
-    existing_schedules = existing_result.scalars().all()
-    
+    # Hours already scheduled this week and on the same day, parsing each
+    # schedule's times once for both totals
     existing_hours = 0
-    for sched in existing_schedules:
-        try:
-            start_h, start_m = map(int, sched.start_time.split(':'))
-            end_h, end_m = map(int, sched.end_time.split(':'))
-            start_decimal = start_h + start_m / 60
-            end_decimal = end_h + end_m / 60
-            hours = end_decimal - start_decimal if end_decimal > start_decimal else 24 - start_decimal + end_decimal
+    existing_weekly_hours = 0
+    for sched in week_schedules:
+        hours = span_hours(sched.start_time, sched.end_time) or 0
+        existing_weekly_hours += hours
+        if sched.date == schedule_data.date:
             existing_hours += hours
-        except:
-            pass
     
     # CONSTRAINT 2: Total hours for the day must be 9 hrs (8 hrs work + 1 hr break)
     total_daily_hours = existing_hours + shift_hours
@@ -6104,27 +6350,6 @@ async def create_schedule(
             overtime_hours = total_daily_hours - 8
     
     # CONSTRAINT 3: Check weekly hours - max 40 hours per week
-    week_result = await db.execute(
-        select(Schedule).filter(
-            Schedule.employee_id == schedule_data.employee_id,
-            Schedule.date >= week_start,
-            Schedule.date <= week_end
-        )
-    )
-    week_schedules = week_result.scalars().all()
-    
-    existing_weekly_hours = 0
-    for sched in week_schedules:
-        try:
-            start_h, start_m = map(int, sched.start_time.split(':'))
-            end_h, end_m = map(int, sched.end_time.split(':'))
-            start_decimal = start_h + start_m / 60
-            end_decimal = end_h + end_m / 60
-            hours = end_decimal - start_decimal if end_decimal > start_decimal else 24 - start_decimal + end_decimal
-            existing_weekly_hours += hours
-        except:
-            pass
-    
     total_weekly_hours = existing_weekly_hours + shift_hours
     weekly_overtime_hours = 0
     
@@ -6239,13 +6464,20 @@ async def update_schedule(
     if schedule_data.date and schedule_data.date != schedule.date:
         new_date = schedule_data.date if isinstance(schedule_data.date, date) else datetime.strptime(schedule_data.date, '%Y-%m-%d').date()
         
+        # Both constraint checks work from the same week's rows, loaded once
+        week_schedules = await load_week_schedules(schedule.employee_id, new_date, db)
+        
         # CONSTRAINT 1: Check 5 shifts per week limit
-        is_valid, error_msg = await validate_5_shifts_per_week(schedule.employee_id, new_date, db, exclude_schedule_id=schedule_id)
+        is_valid, error_msg = await validate_5_shifts_per_week(
+            schedule.employee_id, new_date, db, exclude_schedule_id=schedule_id, week_schedules=week_schedules
+        )
         if not is_valid:
             raise HTTPException(status_code=400, detail=error_msg)
         
         # CONSTRAINT 2: Check 5 consecutive shifts limit
-        is_valid, error_msg = await validate_consecutive_shifts_limit(schedule.employee_id, new_date, db, exclude_schedule_id=schedule_id)
+        is_valid, error_msg = await validate_consecutive_shifts_limit(
+            schedule.employee_id, new_date, db, exclude_schedule_id=schedule_id, week_schedules=week_schedules
+        )
         if not is_valid:
             raise HTTPException(status_code=400, detail=error_msg)
 
@@ -6258,13 +6490,9 @@ async def update_schedule(
     schedule.updated_at = datetime.utcnow()
     await db.commit()
 
-    # Re-fetch with eager loading
-    result = await db.execute(
-        select(Schedule)
-        .filter(Schedule.id == schedule_id)
-        .options(selectinload(Schedule.role))
-    )
-    return result.scalar_one()
+    # Attributes stay loaded after commit (expire_on_commit=False) and
+    # ScheduleResponse has no relationships, so no re-fetch is needed
+    return schedule
 
 
 @app.delete("/schedules/{schedule_id}")
@@ -6273,18 +6501,42 @@ async def delete_schedule(
     current_user: User = Depends(require_manager),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(select(Schedule).filter(Schedule.id == schedule_id))
-    schedule = result.scalar_one_or_none()
-
-    if not schedule:
-        raise HTTPException(status_code=404, detail="Schedule not found")
-
+    # Managers may only delete schedules of their own department; the check is part
+    # of the DELETE itself rather than a separate SELECT of the schedule
+    target_filter = [Schedule.id == schedule_id]
     if current_user.user_type == UserType.MANAGER:
         manager_dept = await get_manager_department(current_user, db)
-        if not manager_dept or schedule.department_id != manager_dept:
-            raise HTTPException(status_code=403, detail="Can only delete schedules in your department")
+        target_filter.append(Schedule.department_id == manager_dept)
+    target = select(Schedule.id).filter(*target_filter).cte('target')
+
+    # The schedule's check-in and attendance go with it (the ORM delete-orphan cascade),
+    # removed by data-modifying CTEs of the same statement
+    delete_check_in = (
+        delete(CheckInOut)
+        .where(CheckInOut.schedule_id.in_(select(target.c.id)))
+        .cte('delete_check_in')
+    )
+    delete_attendance = (
+        delete(Attendance)
+        .where(Attendance.schedule_id.in_(select(target.c.id)))
+        .cte('delete_attendance')
+    )
+    result = await db.execute(
+        delete(Schedule)
+        .where(Schedule.id.in_(select(target.c.id)))
+        .add_cte(delete_check_in)
+        .add_cte(delete_attendance)
+        .returning(Schedule.id)
+        .execution_options(synchronize_session=False)
+    )
+
+    if result.first() is None:
+        # Nothing deleted: tell a missing schedule apart from another department's
+        exists_result = await db.execute(select(Schedule.id).filter(Schedule.id == schedule_id))
+        if exists_result.scalar() is None:
+            raise HTTPException(status_code=404, detail="Schedule not found")
+        raise HTTPException(status_code=403, detail="Can only delete schedules in your department")
 
-    await db.delete(schedule)
     await db.commit()
 
     return {"message": "Schedule deleted successfully"}
@@ -6309,18 +6561,19 @@ async def generate_schedules(
     5. Respect min_emp and max_emp constraints for each shift
     """
     try:
-        print(f"[DEBUG] Schedule generation started for dates {start_date} to {end_date}", flush=True)
+        logger.debug("Schedule generation started for dates %s to %s", start_date, end_date)
 
         # Get manager's department
         department_id = await get_manager_department(current_user, db)
         if not department_id:
             raise HTTPException(status_code=400, detail="Manager department not found")
 
-        print(f"[DEBUG] Department ID: {department_id}", flush=True)
+        logger.debug("Department ID: %s", department_id)
 
         # ===== NEW: Check if schedules already exist in this date range =====
         existing_schedules_result = await db.execute(
             select(Schedule)
+            .options(*strict_loading())
             .filter(
                 Schedule.department_id == department_id,
                 Schedule.date >= start_date,
@@ -6345,79 +6598,51 @@ async def generate_schedules(
                 "schedules": []
             }
         
-        # ===== PRESERVE SCHEDULES WITH CHECK-INS DURING REGENERATION =====
-        # Get schedule IDs that have check-in records - these should NOT be deleted
-        schedules_with_checkins = set()
-        if existing_schedules and regenerate:
-            checkin_sched_result = await db.execute(
-                select(CheckInOut.schedule_id)
-                .where(CheckInOut.schedule_id != None)
-                .distinct()
-            )
-            schedules_with_checkins = set(checkin_sched_result.scalars().all())
-            
-            if schedules_with_checkins:
-                print(f"[DEBUG] Found {len(schedules_with_checkins)} schedules with check-in records - will skip deletion", flush=True)
-        
         # If regenerate is True, delete existing schedules first (but PRESERVE leaves, comp-off, and schedules with check-ins)
         if existing_schedules and regenerate:
-            print(f"[DEBUG] Regenerating - deleting {len(existing_schedules)} existing schedules (excluding ones with check-ins)", flush=True)
+            logger.debug("Regenerating - deleting %s existing schedules (excluding ones with check-ins)", len(existing_schedules))
             
-            # Get ONLY 'scheduled' schedules to delete (will recreate them)
-            # BUT: Exclude any that have check-in records
+            # Delete ONLY 'scheduled' work shifts (they will be recreated)
             # Preserve: 'leave', 'leave_half_morning', 'leave_half_afternoon', 'comp_off_earned', 'comp_off_taken'
             # comp_off_taken is approved leave and should NOT be deleted!
-            # Build filter conditions dynamically
-            filter_conditions = [
-                Schedule.department_id == department_id,
-                Schedule.date >= start_date,
-                Schedule.date <= end_date,
-                Schedule.status == 'scheduled'  # Only delete work shifts, NOT approved leaves or comp-off usage
-            ]
-            # Exclude schedules with check-ins if any exist
-            if schedules_with_checkins:
-                filter_conditions.append(~Schedule.id.in_(list(schedules_with_checkins)))
-            
-            schedules_to_delete_result = await db.execute(
-                select(Schedule.id).filter(*filter_conditions)
-            )
-            schedules_to_delete_ids = schedules_to_delete_result.scalars().all()
-            
-            if schedules_to_delete_ids:
-                print(f"[DEBUG] Deleting {len(schedules_to_delete_ids)} work shift schedules (excluding {len(schedules_with_checkins)} with check-ins)", flush=True)
-                
-                # IMPORTANT: Do NOT touch check-in records - they are historical data
-                # Just delete the schedules that don't have check-ins
-                
-                # Nullify in CompOffRequest table (preserve comp-off requests)
-                await db.execute(
-                    update(CompOffRequest)
-                    .where(CompOffRequest.schedule_id.in_(schedules_to_delete_ids))
-                    .values(schedule_id=None)
-                )
-                
-                # Nullify in Attendance table (preserve attendance records but remove schedule reference)
-                await db.execute(
-                    update(Attendance)
-                    .where(Attendance.schedule_id.in_(schedules_to_delete_ids))
-                    .values(schedule_id=None)
+            # Schedules with check-in records are historical data and are kept as well
+            replaced_schedules = (
+                select(Schedule.id)
+                .filter(
+                    Schedule.department_id == department_id,
+                    Schedule.date >= start_date,
+                    Schedule.date <= end_date,
+                    Schedule.status == 'scheduled',
+                    ~select(CheckInOut.id).where(CheckInOut.schedule_id == Schedule.id).exists()
                 )
+                .cte('replaced_schedules')
+            )
             
-            # Now delete ONLY the work shift schedules that don't have check-ins
-            # (do NOT delete comp-off taken or approved leaves or schedules with check-ins)
-            delete_filter_conditions = [
-                Schedule.department_id == department_id,
-                Schedule.date >= start_date,
-                Schedule.date <= end_date,
-                Schedule.status == 'scheduled'  # Only delete work shifts, NOT comp-off taken or leaves
-            ]
-            # Exclude schedules with check-ins if any exist
-            if schedules_with_checkins:
-                delete_filter_conditions.append(~Schedule.id.in_(list(schedules_with_checkins)))
-            
-            await db.execute(
-                delete(Schedule).filter(*delete_filter_conditions)
+            # Comp-off requests and attendance keep their rows but lose the schedule reference.
+            # Everything runs as one statement so the id list never leaves the database;
+            # updated_at is set explicitly because two onupdate defaults would share a bind name.
+            unlinked_at = datetime.utcnow()
+            unlink_comp_offs = (
+                update(CompOffRequest)
+                .where(CompOffRequest.schedule_id.in_(select(replaced_schedules.c.id)))
+                .values(schedule_id=null(), updated_at=literal(unlinked_at))
+                .cte('unlink_comp_offs')
+            )
+            unlink_attendance = (
+                update(Attendance)
+                .where(Attendance.schedule_id.in_(select(replaced_schedules.c.id)))
+                .values(schedule_id=null(), updated_at=literal(unlinked_at))
+                .cte('unlink_attendance')
             )
+            deleted_result = await db.execute(
+                delete(Schedule)
+                .where(Schedule.id.in_(select(replaced_schedules.c.id)))
+                .add_cte(unlink_comp_offs)
+                .add_cte(unlink_attendance)
+                .returning(Schedule.id)
+                .execution_options(synchronize_session=False)
+            )
+            logger.debug("Deleted %s work shift schedules", len(deleted_result.all()))
             await db.commit()
             feedback = [f"Cleared work shift schedules. Generating new schedule (preserving comp-off, regular leaves, and schedules with check-ins)..."]
         else:
@@ -6426,10 +6651,12 @@ async def generate_schedules(
         # Get all roles in this department
         roles_result = await db.execute(
             select(Role)
+            .options(*strict_loading())
             .filter(Role.department_id == department_id, Role.is_active == True)
         )
         roles = roles_result.scalars().all()
-        print(f"[DEBUG] Found {len(roles)} roles", flush=True)
+        roles_by_id = {r.id: r for r in roles}
+        logger.debug("Found %s roles", len(roles))
 
         if not roles:
             return {
@@ -6445,42 +6672,24 @@ async def generate_schedules(
         role_ids = [r.id for r in roles]
         shifts_result = await db.execute(
             select(Shift)
+            .options(*strict_loading())
             .filter(Shift.role_id.in_(role_ids), Shift.is_active == True)
         )
         shifts = shifts_result.scalars().all()
-        print(f"[DEBUG] Found {len(shifts)} shifts", flush=True)
+        logger.debug("Found %s shifts", len(shifts))
 
-        # Log shift details and ensure all shifts have schedule_config
-        print(f"[DEBUG] Processing {len(shifts)} shifts for schedule_config validation", flush=True)
+        # schedule_config already holds all seven days: the shift schemas normalize it on
+        # write and normalize_shift_schedule_configs() migrates older rows at startup
+        enabled_days_per_shift = {}
         for shift in shifts:
-            # For backward compatibility:
-            # - If shift has NO schedule_config or empty, assume ALL days are enabled
-            # - If shift has schedule_config, use the configured days
-            if not shift.schedule_config or not isinstance(shift.schedule_config, dict) or len(shift.schedule_config) == 0:
-                print(f"[DEBUG] Shift {shift.id} ({shift.name}) has empty/invalid schedule_config, enabling all days for backward compatibility", flush=True)
-                # Old shift without schedule_config - enable all days for backward compatibility
-                shift.schedule_config = {
-                    'Monday': {'enabled': True},
-                    'Tuesday': {'enabled': True},
-                    'Wednesday': {'enabled': True},
-                    'Thursday': {'enabled': True},
-                    'Friday': {'enabled': True},
-                    'Saturday': {'enabled': True},
-                    'Sunday': {'enabled': True}
-                }
-            else:
-                # Ensure all days have proper structure
-                if isinstance(shift.schedule_config, dict):
-                    for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']:
-                        if day not in shift.schedule_config or not isinstance(shift.schedule_config[day], dict):
-                            # Missing day or malformed - fix it
-                            shift.schedule_config[day] = {'enabled': False}
-                        elif 'enabled' not in shift.schedule_config[day]:
-                            # Missing 'enabled' key - add it
-                            shift.schedule_config[day]['enabled'] = False
-            
-            enabled_days = [day for day, cfg in shift.schedule_config.items() if isinstance(cfg, dict) and cfg.get('enabled', False)]
-            print(f"[DEBUG] Final Shift: {shift.id} - {shift.name}, enabled_days={enabled_days}", flush=True)
+            enabled_days_per_shift[shift.id] = {
+                day for day, cfg in shift.schedule_config.items() if cfg.get('enabled')
+            }
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Final Shift: %s - %s, enabled_days=%s", shift.id, shift.name,
+                    sorted(enabled_days_per_shift[shift.id], key=WEEKDAY_NAMES.index)
+                )
 
         if not shifts:
             return {
@@ -6495,14 +6704,19 @@ async def generate_schedules(
         # Get all employees in the department
         employees_result = await db.execute(
             select(Employee)
+            .options(*strict_loading())
             .filter(Employee.department_id == department_id, Employee.is_active == True)
         )
         employees = employees_result.scalars().all()
-        print(f"[DEBUG] Found {len(employees)} employees", flush=True)
+        logger.debug("Found %s employees", len(employees))
 
         # Log employee details
-        for emp in employees:
-            print(f"[DEBUG] Employee: {emp.id} - {emp.first_name}, active={emp.is_active}, weekly_hours={emp.weekly_hours}, daily_max={emp.daily_max_hours}, shifts_per_week={emp.shifts_per_week}", flush=True)
+        if logger.isEnabledFor(logging.DEBUG):
+            for emp in employees:
+                logger.debug(
+                    "Employee: %s - %s, active=%s, weekly_hours=%s, daily_max=%s, shifts_per_week=%s",
+                    emp.id, emp.first_name, emp.is_active, emp.weekly_hours, emp.daily_max_hours, emp.shifts_per_week
+                )
 
         if not employees:
             return {
@@ -6525,64 +6739,175 @@ async def generate_schedules(
         for shift in shifts:
             shifts_by_role[shift.role_id].append(shift)
 
+        # Shift length in hours, parsed once per shift rather than per candidate
+        shift_hours = {}
+        for shift in shifts:
+            shift_start = datetime.strptime(shift.start_time, '%H:%M')
+            shift_end = datetime.strptime(shift.end_time, '%H:%M')
+            shift_hours[shift.id] = (shift_end - shift_start).total_seconds() / 3600
+
         # Calculate which employees are eligible for each shift (based on role)
         # Strategy: Assign employees to shifts day-by-day
         # Each employee gets ONE shift per day maximum (no double shifts)
         # If shifts are Mon-Friday, all eligible employees get all 5 days
         eligible_for_shift = {}  # {shift_id: [emp1, emp2, emp3...]} - only eligible employees per shift
 
-        print(f"[DEBUG] Building eligibility matrix for {len(shifts)} shifts and {len(employees)} employees", flush=True)
+        logger.debug("Building eligibility matrix for %s shifts and %s employees", len(shifts), len(employees))
+        # Employee is eligible if:
+        # 1. They have no specific role assignment (flexible, role_id None), OR
+        # 2. Their role matches the shift's role
+        # Bucket employees by role once; each shift merges the flexible bucket with its
+        # role's bucket by position so candidates keep the department's employee order
+        employees_by_role = defaultdict(list)  # {role_id or None: [(position, emp)]}
+        for position, emp in enumerate(employees):
+            employees_by_role[emp.role_id].append((position, emp))
         for shift in shifts:
-            eligible_for_shift[shift.id] = []
-            
-            for emp in employees:
-                # Employee is eligible if:
-                # 1. They have no specific role assignment (flexible=True), OR
-                # 2. Their role matches the shift's role
-                is_eligible = (emp.role_id is None) or (emp.role_id == shift.role_id)
-                
-                if is_eligible:
-                    eligible_for_shift[shift.id].append(emp)
-                    print(f"[DEBUG] Shift {shift.id} ({shift.name}): {emp.id} ({emp.first_name}) is ELIGIBLE", flush=True)
-                else:
-                    print(f"[DEBUG] Shift {shift.id} ({shift.name}): {emp.id} ({emp.first_name}) is NOT eligible (role mismatch: emp.role={emp.role_id} vs shift.role={shift.role_id})", flush=True)
+            eligible_for_shift[shift.id] = [
+                emp for _, emp in merge(employees_by_role[None], employees_by_role[shift.role_id])
+            ]
+            logger.debug("Shift %s (%s): %s eligible employees", shift.id, shift.name, len(eligible_for_shift[shift.id]))
+
+        # Approved leaves and comp-offs for the whole range, fetched once and
+        # keyed by (employee_id, date) so the assignment loop can look them up
+        emp_ids = [emp.id for emp in employees]
+        leaves_result = await db.execute(
+            select(LeaveRequest)
+            .options(*strict_loading())
+            .filter(
+                LeaveRequest.employee_id.in_(emp_ids),
+                LeaveRequest.status == LeaveStatus.APPROVED,
+                LeaveRequest.start_date <= end_date,
+                LeaveRequest.end_date >= start_date
+            )
+            .order_by(LeaveRequest.id)
+        )
+        leave_map = {}
+        for leave in leaves_result.scalars().all():
+            leave_day = max(leave.start_date, start_date)
+            last_day = min(leave.end_date, end_date)
+            while leave_day <= last_day:
+                leave_map.setdefault((leave.employee_id, leave_day), leave)
+                leave_day += timedelta(days=1)
+        
+        comp_offs_result = await db.execute(
+            select(CompOffRequest)
+            .options(*strict_loading())
+            .filter(
+                CompOffRequest.employee_id.in_(emp_ids),
+                CompOffRequest.status == LeaveStatus.APPROVED,
+                CompOffRequest.comp_off_date >= start_date,
+                CompOffRequest.comp_off_date <= end_date
+            )
+            .order_by(CompOffRequest.id)
+        )
+        comp_off_map = {}
+        for comp_off in comp_offs_result.scalars().all():
+            comp_off_map.setdefault((comp_off.employee_id, comp_off.comp_off_date), comp_off)
+
+        # Existing schedules of these employees for every Mon-Sun week the range
+        # touches, loaded once. The index is updated as schedules are created
+        # below, so the per-candidate checks never go back to the database.
+        index_start = week_bounds(start_date)[0]
+        index_end = week_bounds(end_date)[1]
+        index_result = await db.execute(
+            select(
+                Schedule.id, Schedule.employee_id, Schedule.date, Schedule.start_time,
+                Schedule.end_time, Schedule.status, Role.break_minutes
+            )
+            .outerjoin(Role, Role.id == Schedule.role_id)
+            .filter(
+                Schedule.employee_id.in_(emp_ids),
+                Schedule.date >= index_start,
+                Schedule.date <= index_end
+            )
+            .order_by(Schedule.id)
+        )
+        schedules_by_emp_date = defaultdict(lambda: defaultdict(list))  # {emp_id: {date: [slots]}}
+        schedules_by_emp_week = defaultdict(lambda: defaultdict(list))  # {emp_id: {week_start: [slots]}}
+        
+        # Work days per week as a bitmask (bit 0 = Monday) for the consecutive-shift check
+        work_days_by_emp_week = defaultdict(lambda: defaultdict(int))  # {emp_id: {week_start: mask}}
+        # Latest work schedule per (emp_id, weekday) for the comp-off time fallback, looked up
+        # in the database once per key and kept current as schedules are created below
+        latest_by_emp_weekday = {}  # {(emp_id, weekday): row with date/start_time/end_time, or None}
+        # Running [weekday coverage, weekend shifts] per week for the 5-shifts-per-week rule
+        shift_counts_by_emp_week = defaultdict(lambda: defaultdict(lambda: [0, 0]))  # {emp_id: {week_start: counts}}
+        # Running work hours (break already subtracted) per week and per day; 'leave' and
+        # 'comp_off_taken' entries fulfil the weekly requirement but add no hours
+        work_hours_by_emp_week = defaultdict(lambda: defaultdict(float))  # {emp_id: {week_start: hours}}
+        work_hours_by_emp_date = defaultdict(lambda: defaultdict(float))  # {emp_id: {date: hours}}
+        # Holiday-aware week info, built once per week of the range
+        week_info_by_start = {}
+        
+        def index_schedule(slot):
+            week_start = week_bounds(slot.date)[0]
+            schedules_by_emp_date[slot.employee_id][slot.date].append(slot)
+            schedules_by_emp_week[slot.employee_id][week_start].append(slot)
+            if slot.date.weekday() < 5:
+                if slot.status in WEEKDAY_COVERAGE_STATUSES:
+                    shift_counts_by_emp_week[slot.employee_id][week_start][0] += 1
+            elif slot.status in WEEKEND_SHIFT_STATUSES:
+                shift_counts_by_emp_week[slot.employee_id][week_start][1] += 1
+            if slot.status in ('scheduled', 'completed', 'comp_off_earned'):
+                work_hours_by_emp_week[slot.employee_id][week_start] += slot.work_hours
+                work_hours_by_emp_date[slot.employee_id][slot.date] += slot.work_hours
+                work_days_by_emp_week[slot.employee_id][week_start] |= 1 << slot.date.weekday()
+                key = (slot.employee_id, slot.date.weekday())
+                if key in latest_by_emp_weekday and (
+                    latest_by_emp_weekday[key] is None or slot.date >= latest_by_emp_weekday[key].date
+                ):
+                    latest_by_emp_weekday[key] = slot
+        
+        for sched_id, emp_id, sched_date, sched_start, sched_end, sched_status, break_minutes in index_result.all():
+            index_schedule(ScheduleSlot(
+                sched_id, emp_id, sched_date, sched_start, sched_end, sched_status,
+                schedule_work_hours(sched_start, sched_end, break_minutes)
+            ))
+
+        # New schedules are collected as plain rows and written with a single
+        # bulk INSERT instead of going through the unit of work one by one
+        pending_rows = []
+        
+        async def flush_pending_rows():
+            if pending_rows:
+                await db.execute(insert(Schedule), pending_rows)
+                pending_rows.clear()
+
+        # Public holidays in the range, resolved in one pass
+        holidays_in_range = jp_calendar.get_holidays_in_range(start_date, end_date)
 
         # Create schedules
         current_date = start_date
         while current_date <= end_date:
-            day_name = current_date.strftime('%A')  # e.g., 'Monday', 'Sunday'
+            # Per-day values shared by every shift and candidate below
+            weekday = current_date.weekday()
+            day_name = WEEKDAY_NAMES[weekday]  # e.g., 'Monday', 'Sunday'
+            day_bit = 1 << weekday  # this day's bit in the weekly work-day masks
+            week_start = week_bounds(current_date)[0]
+            if week_start not in week_info_by_start:
+                week_info_by_start[week_start] = jp_calendar.get_week_info(week_start)
             
             # ===== SKIP PUBLIC HOLIDAYS - Don't assign shifts on holidays =====
-            if is_japanese_holiday(current_date):
-                holiday_name = get_japanese_holiday_name(current_date)
-                print(f"[DEBUG] Skipping {current_date} ({day_name}) - Public Holiday: {holiday_name}", flush=True)
+            holiday_name = holidays_in_range.get(current_date)
+            if holiday_name:
+                logger.debug("Skipping %s (%s) - Public Holiday: %s", current_date, day_name, holiday_name)
                 current_date += timedelta(days=1)
                 continue
 
             for shift in shifts:
                 # Check if shift operates on this day
-                role = next((r for r in roles if r.id == shift.role_id), None)
+                role = roles_by_id.get(shift.role_id)
                 
                 # Determine if this shift should run on this day
-                should_skip = False
-                
-                if shift.schedule_config and isinstance(shift.schedule_config, dict):
-                    # Shift has a schedule_config with day configuration
-                    day_config = shift.schedule_config.get(day_name, {})
-                    is_day_enabled = day_config.get('enabled', False) if isinstance(day_config, dict) else False
-                    
-                    if not is_day_enabled:
-                        should_skip = True
-                        print(f"[DEBUG] ✗ Shift {shift.id} ({shift.name}) - Day {day_name} is disabled, skipping", flush=True)
-                    else:
-                        print(f"[DEBUG] ✓ Shift {shift.id} ({shift.name}) - Day {day_name} is ENABLED, processing", flush=True)
-                else:
-                    # No schedule_config or invalid format - skip to prevent unintended assignments
-                    should_skip = True
-                    print(f"[DEBUG] ✗ Shift {shift.id} ({shift.name}) - No valid schedule_config, skipping {day_name}", flush=True)
-
-                if should_skip:
+                if day_name not in enabled_days_per_shift[shift.id]:
+                    logger.debug("✗ Shift %s (%s) - Day %s is disabled, skipping", shift.id, shift.name, day_name)
                     continue
+                logger.debug("✓ Shift %s (%s) - Day %s is ENABLED, processing", shift.id, shift.name, day_name)
+
+                # Calculate shift hours (total time) and work hours (minus breaks)
+                total_shift_hours = shift_hours[shift.id]
+                break_hours = (role.break_minutes or 0) / 60
+                work_hours = total_shift_hours - break_hours
 
                 # Assign employees to this shift on this day
                 # Only consider employees who are eligible for this shift
@@ -6590,38 +6915,14 @@ async def generate_schedules(
                 
                 for emp in eligible_for_shift[shift.id]:
                     # Check leave - if employee is on approved leave, mark them as leave (not shift)
-                    leave_result = await db.execute(
-                        select(LeaveRequest)
-                        .filter(
-                            LeaveRequest.employee_id == emp.id,
-                            LeaveRequest.start_date <= current_date,
-                            LeaveRequest.end_date >= current_date,
-                            LeaveRequest.status == LeaveStatus.APPROVED
-                        )
-                    )
-                    leave_request = leave_result.scalars().first()
+                    leave_request = leave_map.get((emp.id, current_date))
                     
                     # Also check for approved comp-off requests
-                    comp_off_result = await db.execute(
-                        select(CompOffRequest)
-                        .filter(
-                            CompOffRequest.employee_id == emp.id,
-                            CompOffRequest.comp_off_date == current_date,
-                            CompOffRequest.status == LeaveStatus.APPROVED
-                        )
-                    )
-                    comp_off_request = comp_off_result.scalars().first()
+                    comp_off_request = comp_off_map.get((emp.id, current_date))
                     
                     if leave_request or comp_off_request:
                         # Employee is on approved leave or comp-off - create appropriate schedule entry
-                        existing_today = await db.execute(
-                            select(Schedule)
-                            .filter(
-                                Schedule.employee_id == emp.id,
-                                Schedule.date == current_date
-                            )
-                        )
-                        if not existing_today.scalars().first():
+                        if not schedules_by_emp_date[emp.id].get(current_date):
                             # Determine status based on type
                             if comp_off_request:
                                 # This is a comp-off earned day (employee worked, earned comp-off)
@@ -6629,40 +6930,35 @@ async def generate_schedules(
                                 leave_status = 'comp_off_earned'
                                 
                                 # Try to get shift times from same week first
-                                week_start = current_date - timedelta(days=current_date.weekday())
-                                week_end = week_start + timedelta(days=6)
-                                
-                                week_shift = await db.execute(
-                                    select(Schedule)
-                                    .filter(
-                                        Schedule.employee_id == emp.id,
-                                        Schedule.date >= week_start,
-                                        Schedule.date <= week_end,
-                                        Schedule.date != current_date,
-                                        Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])
-                                    )
-                                    .order_by(Schedule.date)
-                                    .limit(1)
+                                week_sched = min(
+                                    (
+                                        slot for slot in schedules_by_emp_week[emp.id].get(week_start, [])
+                                        if slot.date != current_date
+                                        and slot.status in ('scheduled', 'completed', 'comp_off_earned')
+                                    ),
+                                    key=lambda slot: slot.date,
+                                    default=None
                                 )
-                                week_sched = week_shift.scalar_one_or_none()
                                 
                                 if week_sched and week_sched.start_time and week_sched.end_time:
                                     start_time = week_sched.start_time
                                     end_time = week_sched.end_time
                                 else:
                                     # Fallback to same day of week from previous weeks
-                                    day_name = current_date.strftime('%A')
-                                    same_day = await db.execute(
-                                        select(Schedule)
-                                        .filter(
-                                            Schedule.employee_id == emp.id,
-                                            func.to_char(Schedule.date, 'Day').ilike(f'%{day_name}%'),
-                                            Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])
+                                    if (emp.id, weekday) not in latest_by_emp_weekday:
+                                        await flush_pending_rows()
+                                        same_day = await db.execute(
+                                            select(Schedule.date, Schedule.start_time, Schedule.end_time)
+                                            .filter(
+                                                Schedule.employee_id == emp.id,
+                                                extract('isodow', Schedule.date) == current_date.isoweekday(),
+                                                Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])
+                                            )
+                                            .order_by(Schedule.date.desc())
+                                            .limit(1)
                                         )
-                                        .order_by(Schedule.date.desc())
-                                        .limit(1)
-                                    )
-                                    same_day_sched = same_day.scalar_one_or_none()
+                                        latest_by_emp_weekday[(emp.id, weekday)] = same_day.first()
+                                    same_day_sched = latest_by_emp_weekday[(emp.id, weekday)]
                                     
                                     if same_day_sched and same_day_sched.start_time and same_day_sched.end_time:
                                         start_time = same_day_sched.start_time
@@ -6699,136 +6995,56 @@ async def generate_schedules(
                                 leave_notes = f"Full Day Leave - {leave_request.leave_type}"
 
                             leave_type_desc = 'comp-off' if comp_off_request else leave_request.leave_type
-                            print(f"[DEBUG] ✓ {emp.first_name} is on approved {leave_type_desc} on {current_date}, creating {leave_status} schedule", flush=True)
-                            leave_schedule = Schedule(
-                                department_id=department_id,
-                                employee_id=emp.id,
-                                role_id=shift.role_id,
-                                shift_id=shift.id,
-                                date=current_date,
-                                start_time=start_time,
-                                end_time=end_time,
-                                status=leave_status,
-                                notes=leave_notes
-                            )
-                            db.add(leave_schedule)
+                            logger.debug("✓ %s is on approved %s on %s, creating %s schedule", emp.first_name, leave_type_desc, current_date, leave_status)
+                            pending_rows.append({
+                                "department_id": department_id,
+                                "employee_id": emp.id,
+                                "role_id": shift.role_id,
+                                "shift_id": shift.id,
+                                "date": current_date,
+                                "start_time": start_time,
+                                "end_time": end_time,
+                                "status": leave_status,
+                                "notes": leave_notes
+                            })
+                            index_schedule(ScheduleSlot(
+                                None, emp.id, current_date, start_time, end_time, leave_status,
+                                schedule_work_hours(start_time, end_time, role.break_minutes)
+                            ))
                             schedules_created += 1
                         else:
-                            print(f"[DEBUG] ✗ {emp.first_name} already has a schedule entry on {current_date}, skipping leave creation", flush=True)
+                            logger.debug("✗ %s already has a schedule entry on %s, skipping leave creation", emp.first_name, current_date)
                         continue  # Don't assign shift for leave/comp-off day
                     
                     # CRITICAL: Check if employee already has a shift on this day (NO DOUBLE SHIFTS)
-                    existing_today = await db.execute(
-                        select(Schedule)
-                        .filter(
-                            Schedule.employee_id == emp.id,
-                            Schedule.date == current_date
-                        )
-                    )
-                    if existing_today.scalars().first():
-                        print(f"[DEBUG] ✗ {emp.first_name} already has a shift on {current_date}, skipping (NO DOUBLE SHIFTS)", flush=True)
+                    if schedules_by_emp_date[emp.id].get(current_date):
+                        logger.debug("✗ %s already has a shift on %s, skipping (NO DOUBLE SHIFTS)", emp.first_name, current_date)
                         continue  # Skip if employee already has a shift today
                     
-                    print(f"[DEBUG] Checking {emp.first_name} ({emp.id}) for shift {shift.id} ({shift.name}) on {current_date}", flush=True)
+                    logger.debug("Checking %s (%s) for shift %s (%s) on %s", emp.first_name, emp.id, shift.id, shift.name, current_date)
                     
                     # Check 5 consecutive shifts limit
-                    week_start = current_date - timedelta(days=current_date.weekday())
-                    week_end = week_start + timedelta(days=6)
-                    
-                    consecutive_check = await db.execute(
-                        select(Schedule)
-                        .filter(
-                            Schedule.employee_id == emp.id,
-                            Schedule.date >= week_start,
-                            Schedule.date <= week_end,
-                            Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])  # Exclude 'leave', 'comp_off_taken' status
-                        )
-                        .order_by(Schedule.date)
-                    )
-                    week_schedules = consecutive_check.scalars().all()
-                    
-                    # Check consecutive shifts INCLUDING the new one
+                    # Check consecutive shifts INCLUDING the new one; it only needs the week's mask,
+                    # so it runs before any per-candidate list or hour totals are built
                     # NOTE: Leave days are not counted as "shifts" for the consecutive limit
-                    week_dates = [s.date for s in week_schedules]
-                    if current_date not in week_dates:
-                        week_dates.append(current_date)
-                    
-                    week_dates.sort()
-                    max_consecutive = 1
-                    current_consecutive = 1
-                    
-                    for i in range(1, len(week_dates)):
-                        if (week_dates[i] - week_dates[i-1]).days == 1:
-                            current_consecutive += 1
-                            max_consecutive = max(max_consecutive, current_consecutive)
-                        else:
-                            current_consecutive = 1
-                    
-                    if max_consecutive > 5:
-                        print(f"[DEBUG] ✗ {emp.first_name} would have {max_consecutive} consecutive shifts, skipping (MAX 5 consecutive)", flush=True)
+                    # A run of 6 work days shows up as 6 overlapping bits in the week's mask
+                    work_days = work_days_by_emp_week[emp.id].get(week_start, 0) | day_bit
+                    if work_days & (work_days >> 1) & (work_days >> 2) & (work_days >> 3) & (work_days >> 4) & (work_days >> 5):
+                        logger.debug("✗ %s would have more than 5 consecutive shifts, skipping (MAX 5 consecutive)", emp.first_name)
                         continue  # Skip if would exceed 5 consecutive shifts
 
-                    # Fetch existing schedules for the week (with eager loading of role)
                     # IMPORTANT: Only count actual work shifts, not leave days, for hour calculations
-                    existing_schedules_result = await db.execute(
-                        select(Schedule)
-                        .filter(
-                            Schedule.employee_id == emp.id,
-                            Schedule.date >= week_start,
-                            Schedule.date <= week_end,
-                            Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])  # Exclude 'leave', 'comp_off_taken' status
-                        )
-                        .options(selectinload(Schedule.role))
-                    )
-                    existing_schedules = existing_schedules_result.scalars().all()
-
-                    # Also count leave days for scheduling fairness, but not for hours calculation
-                    leave_schedules_result = await db.execute(
-                        select(Schedule)
-                        .filter(
-                            Schedule.employee_id == emp.id,
-                            Schedule.date >= week_start,
-                            Schedule.date <= week_end,
-                            Schedule.status.in_(['leave', 'leave_half_morning', 'leave_half_afternoon', 'comp_off_taken'])
-                        )
-                    )
-                    leave_schedules = leave_schedules_result.scalars().all()
-                    leave_days_count = len(leave_schedules)
-
-                    # Calculate existing hours in Python, subtracting break time
-                    # NOTE: Leave days don't add to hour count, but they fulfill part of weekly requirement
-                    existing_hours = 0
-                    existing_hours_today = 0
-                    for sched in existing_schedules:
-                        if sched.start_time and sched.end_time:
-                            try:
-                                start = datetime.strptime(sched.start_time, '%H:%M')
-                                end = datetime.strptime(sched.end_time, '%H:%M')
-                                total_hours = (end - start).total_seconds() / 3600
-
-                                # Subtract break time from role
-                                break_hours = (sched.role.break_minutes or 0) / 60 if sched.role else 0
-                                work_hours = total_hours - break_hours
-
-                                existing_hours += work_hours
-                                # Check hours for current day
-                                if sched.date == current_date:
-                                    existing_hours_today += work_hours
-                            except (ValueError, TypeError):
-                                pass
-
-                    # Calculate shift hours (total time) and work hours (minus breaks)
-                    shift_start = datetime.strptime(shift.start_time, '%H:%M')
-                    shift_end = datetime.strptime(shift.end_time, '%H:%M')
-                    total_shift_hours = (shift_end - shift_start).total_seconds() / 3600
-
-                    # Subtract break time from role
-                    break_hours = (role.break_minutes or 0) / 60
-                    work_hours = total_shift_hours - break_hours
+                    # The totals are kept current by index_schedule as schedules are created
+                    existing_hours = work_hours_by_emp_week[emp.id].get(week_start, 0)
+                    existing_hours_today = work_hours_by_emp_date[emp.id].get(current_date, 0)
 
                     # Check both weekly and daily limits using work hours (excluding breaks)
                     daily_max = emp.daily_max_hours or 8
-                    print(f"[DEBUG] {emp.first_name}: weekly {existing_hours:.1f}+{work_hours:.1f}<={emp.weekly_hours}, daily {existing_hours_today:.1f}+{work_hours:.1f}<={daily_max}", flush=True)
+                    logger.debug(
+                        "%s: weekly %.1f+%.1f<=%s, daily %.1f+%.1f<=%s",
+                        emp.first_name, existing_hours, work_hours, emp.weekly_hours,
+                        existing_hours_today, work_hours, daily_max
+                    )
 
                     # ===== Check for overtime (> 9 hours total in a day) =====
                     daily_total_with_shift = existing_hours_today + total_shift_hours
@@ -6845,37 +7061,43 @@ async def generate_schedules(
                             'total_weekly_hours': existing_hours + work_hours,
                             'message': f"Total {daily_total_with_shift:.1f}h on {current_date} (includes {total_shift_hours}h shift)"
                         })
-                        print(f"[DEBUG] ⚠️  OVERTIME: {emp.first_name} would work {daily_total_with_shift:.1f} hours on {current_date}", flush=True)
+                        logger.debug("⚠️  OVERTIME: %s would work %.1f hours on %s", emp.first_name, daily_total_with_shift, current_date)
 
                     if (existing_hours + work_hours <= emp.weekly_hours and
                         existing_hours_today + work_hours <= daily_max):
                         
                         # ===== NEW: Check 5-shifts-per-week limit with holiday awareness =====
-                        is_valid_shifts, shifts_error = await validate_5_shifts_per_week(emp.id, current_date, db)
+                        is_valid_shifts, shifts_error = check_shifts_per_week(
+                            current_date, week_info_by_start[week_start],
+                            *shift_counts_by_emp_week[emp.id].get(week_start, (0, 0))
+                        )
                         if not is_valid_shifts:
-                            print(f"[DEBUG] ✗ {emp.first_name} failed 5-shifts validation on {current_date}: {shifts_error}", flush=True)
+                            logger.debug("✗ %s failed 5-shifts validation on %s: %s", emp.first_name, current_date, shifts_error)
                             continue  # Skip this employee for this shift due to weekly shift limit
                         
-                        print(f"[DEBUG] ✓ Creating schedule for {emp.first_name} on {current_date}", flush=True)
+                        logger.debug("✓ Creating schedule for %s on %s", emp.first_name, current_date)
                         # Create schedule
-                        schedule = Schedule(
-                            department_id=department_id,
-                            employee_id=emp.id,
-                            role_id=shift.role_id,
-                            shift_id=shift.id,
-                            date=current_date,
-                            start_time=shift.start_time,
-                            end_time=shift.end_time,
-                            status="scheduled"
-                        )
-                        db.add(schedule)
+                        pending_rows.append({
+                            "department_id": department_id,
+                            "employee_id": emp.id,
+                            "role_id": shift.role_id,
+                            "shift_id": shift.id,
+                            "date": current_date,
+                            "start_time": shift.start_time,
+                            "end_time": shift.end_time,
+                            "status": "scheduled",
+                            "notes": None
+                        })
+                        index_schedule(ScheduleSlot(
+                            None, emp.id, current_date, shift.start_time, shift.end_time, "scheduled", work_hours
+                        ))
                         schedules_created += 1
                         assigned_count += 1
                         
                         if assigned_count >= shift.max_emp:
                             break  # Max employees for this shift on this day
                     else:
-                        print(f"[DEBUG] ✗ {emp.first_name} failed hours check on {current_date}", flush=True)
+                        logger.debug("✗ %s failed hours check on %s", emp.first_name, current_date)
 
                 # Ensure minimum employees are assigned
                 if assigned_count < shift.min_emp:
@@ -6883,6 +7105,7 @@ async def generate_schedules(
 
             current_date += timedelta(days=1)
 
+        await flush_pending_rows()
         await db.commit()
 
         feedback.insert(0, f"Successfully generated {schedules_created} schedules")
@@ -7056,16 +7279,23 @@ async def record_checkout(
     """
     Record check-out time and calculate worked hours
     """
+    # Schedule, its role (for the break time) and the employee come back in the same row;
+    # they are selected as separate entities so the returned record carries no relationships
     result = await db.execute(
-        select(Attendance).filter(
+        select(Attendance, Schedule, Role, Employee)
+        .join(Employee, Employee.id == Attendance.employee_id)
+        .outerjoin(Schedule, Schedule.id == Attendance.schedule_id)
+        .outerjoin(Role, Role.id == Schedule.role_id)
+        .filter(
             Attendance.id == attendance_id,
             Attendance.employee_id == current_user.employee_id
         )
     )
-    attendance = result.scalar_one_or_none()
+    row = result.one_or_none()
     
-    if not attendance:
+    if not row:
         raise HTTPException(status_code=404, detail="Attendance record not found")
+    attendance, schedule, role, emp = row
     
     if not checkout_data.out_time:
         raise HTTPException(status_code=400, detail="Out time is required")
@@ -7085,9 +7315,7 @@ async def record_checkout(
             total_minutes = out_minutes - in_minutes
             
             # Get role for break time
-            schedule = await db.get(Schedule, attendance.schedule_id)
             if schedule:
-                role = await db.get(Role, schedule.role_id)
                 break_minutes = role.break_minutes if role else 0
             else:
                 break_minutes = 0
@@ -7101,7 +7329,6 @@ async def record_checkout(
             
             # Calculate overtime considering approved overtime
             if schedule:
-                emp = await db.get(Employee, attendance.employee_id)
                 if emp and worked_hours > emp.daily_max_hours:
                     actual_overtime = worked_hours - emp.daily_max_hours
                     
@@ -7201,9 +7428,24 @@ async def get_attendance_summary(
     db: AsyncSession = Depends(get_db)
 ):
     """Get attendance summary for department or individual"""
-    query = select(Attendance).filter(
-        Attendance.date >= start_date,
-        Attendance.date <= end_date
+    # Per-employee totals are aggregated by the database; only one row per employee comes back
+    query = (
+        select(
+            Attendance.employee_id,
+            Employee.first_name,
+            Employee.last_name,
+            func.coalesce(func.sum(Attendance.worked_hours), 0).label('worked'),
+            func.coalesce(func.sum(Attendance.overtime_hours), 0).label('overtime'),
+            func.count(case((Attendance.status == "onTime", 1))).label('on_time'),
+            func.count(case((Attendance.status.in_(["slightlyLate", "late", "veryLate"]), 1))).label('late'),
+            func.count().label('days')
+        )
+        .join(Employee, Employee.id == Attendance.employee_id)
+        .filter(
+            Attendance.date >= start_date,
+            Attendance.date <= end_date
+        )
+        .group_by(Attendance.employee_id, Employee.first_name, Employee.last_name)
     )
     
     if current_user.user_type == UserType.EMPLOYEE:
@@ -7212,48 +7454,23 @@ async def get_attendance_summary(
         manager_dept = await get_manager_department(current_user, db)
         if not manager_dept:
             return []
-        # Get employees in manager's department
-        subquery = select(Employee.id).filter(
-            Employee.department_id == manager_dept
-        )
-        query = query.filter(Attendance.employee_id.in_(subquery))
+        # Only employees in manager's department
+        query = query.filter(Employee.department_id == manager_dept)
     
     result = await db.execute(query)
-    records = result.scalars().all()
-    
-    # Group by employee
-    emp_stats = defaultdict(lambda: {
-        "total_worked_hours": 0,
-        "total_overtime": 0,
-        "on_time": 0,
-        "late": 0,
-        "total_days": 0
-    })
     
-    for record in records:
-        stats = emp_stats[record.employee_id]
-        stats["total_worked_hours"] += record.worked_hours
-        stats["total_overtime"] += record.overtime_hours
-        if record.status == "onTime":
-            stats["on_time"] += 1
-        elif record.status in ["slightlyLate", "late", "veryLate"]:
-            stats["late"] += 1
-        stats["total_days"] += 1
-    
-    # Convert to list with employee details
-    summary_list = []
-    for emp_id, stats in emp_stats.items():
-        emp = await db.get(Employee, emp_id)
-        if emp:
-            summary_list.append({
-                "employee_id": emp_id,
-                "employee_name": f"{emp.first_name} {emp.last_name}",
-                "total_worked_hours": round(stats["total_worked_hours"], 2),
-                "total_overtime": round(stats["total_overtime"], 2),
-                "on_time_percentage": round((stats["on_time"] / stats["total_days"] * 100) if stats["total_days"] > 0 else 0, 2),
-                "late_count": stats["late"],
-                "days_worked": stats["total_days"]
-            })
+    summary_list = [
+        {
+            "employee_id": row.employee_id,
+            "employee_name": f"{row.first_name} {row.last_name}",
+            "total_worked_hours": round(row.worked, 2),
+            "total_overtime": round(row.overtime, 2),
+            "on_time_percentage": round(row.on_time / row.days * 100, 2),
+            "late_count": row.late,
+            "days_worked": row.days
+        }
+        for row in result.all()
+    ]
     
     return {
         "period": {
@@ -7352,19 +7569,22 @@ async def delete_unavailability(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     from app.models import Unavailability
-    result = await db.execute(select(Unavailability).filter(Unavailability.id == unavailability_id))
-    unavailability = result.scalar_one_or_none()
+    # The employee's department comes back with the record for the authority check
+    result = await db.execute(
+        select(Unavailability, Employee.department_id)
+        .outerjoin(Employee, Employee.id == Unavailability.employee_id)
+        .filter(Unavailability.id == unavailability_id)
+    )
+    row = result.one_or_none()
     
-    if not unavailability:
+    if not row:
         raise HTTPException(status_code=404, detail="Unavailability record not found")
+    unavailability, employee_department_id = row
     
     # Verify employee belongs to manager's department
-    result = await db.execute(select(Employee).filter(Employee.id == unavailability.employee_id))
-    employee = result.scalar_one_or_none()
-    
     if current_user.user_type == UserType.MANAGER:
         manager_dept = await get_manager_department(current_user, db)
-        if not manager_dept or employee.department_id != manager_dept:
+        if not manager_dept or employee_department_id != manager_dept:
             raise HTTPException(status_code=403, detail="Not authorized")
     
     await db.delete(unavailability)
@@ -7625,40 +7845,35 @@ async def approve_overtime_request(
     db: AsyncSession = Depends(get_db)
 ):
     """Manager approves an overtime request"""
+    # The employee's department (for the authority check) and user (for the
+    # notification) come back with the request in one query
     result = await db.execute(
-        select(OvertimeRequest).filter(OvertimeRequest.id == request_id)
+        select(OvertimeRequest, Employee.department_id, User.id)
+        .join(Employee, Employee.id == OvertimeRequest.employee_id)
+        .outerjoin(User, User.id == Employee.user_id)
+        .filter(OvertimeRequest.id == request_id)
     )
-    ot_request = result.scalar_one_or_none()
+    row = result.one_or_none()
     
-    if not ot_request:
+    if not row:
         raise HTTPException(status_code=404, detail="Overtime request not found")
+    ot_request, employee_department_id, emp_user_id = row
     
     # Verify manager's authority over employee's department
-    emp_result = await db.execute(
-        select(Employee).filter(Employee.id == ot_request.employee_id)
-    )
-    employee = emp_result.scalar_one_or_none()
-    
     manager_dept = await get_manager_department(current_user, db)
-    if not manager_dept or employee.department_id != manager_dept:
+    if not manager_dept or employee_department_id != manager_dept:
         raise HTTPException(status_code=403, detail="Not authorized")
     
     ot_request.status = OvertimeStatus.APPROVED
     ot_request.approved_at = datetime.utcnow()
     ot_request.approval_notes = approval_data.get("approval_notes", "")
     
-    # Get employee user for notification
-    emp_user_result = await db.execute(
-        select(User).filter(User.id == employee.user_id)
-    )
-    emp_user = emp_user_result.scalar_one_or_none()
-    
     # Create notification for employee
-    if emp_user:
+    if emp_user_id:
         notification_title = f"✅ Overtime Request Approved"
         notification_message = f"Your overtime request for {ot_request.overtime_date} ({ot_request.hours_requested} hours) has been approved."
         await create_notification(
-            user_id=emp_user.id,
+            user_id=emp_user_id,
             title=notification_title,
             message=notification_message,
             notification_type="overtime_approved",
@@ -3,11 +3,13 @@ Database Models for Shift Scheduler - Normalized Schema V6
 Optimized with clean foreign key relationships
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, JSON, Date, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, JSON, Date, Text, Index, extract, Enum as SQLEnum
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 import enum
 
+from app.holidays_jp import WEEKDAY_NAMES
+
 Base = declarative_base()
 
 
@@ -120,6 +122,10 @@ class Employee(Base):
     comp_off_requests = relationship("CompOffRequest", back_populates="employee", cascade="all, delete-orphan")
     comp_off_tracking = relationship("CompOffTracking", back_populates="employee", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index('ix_employee_dept_id', 'department_id', 'id'),
+    )
+
 
 class Role(Base):
     """Role/Position Type model"""
@@ -173,6 +179,12 @@ class Schedule(Base):
     check_in = relationship("CheckInOut", back_populates="schedule", uselist=False, cascade="all, delete-orphan")
     attendance = relationship("Attendance", back_populates="schedule", uselist=False, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index('ix_schedule_emp_date', 'employee_id', 'date'),
+        Index('ix_schedule_dept_date_status', 'department_id', 'date', 'status'),
+        Index('ix_schedule_emp_isodow', 'employee_id', extract('isodow', date)),
+    )
+
 
 class LeaveRequest(Base):
     """Leave requests with approval workflow"""
@@ -195,6 +207,10 @@ class LeaveRequest(Base):
     employee = relationship("Employee", back_populates="leave_requests")
     manager = relationship("Manager", back_populates="leave_requests")
 
+    __table_args__ = (
+        Index('ix_leave_emp_type_status', 'employee_id', 'leave_type', 'status'),
+    )
+
 
 class CheckInOut(Base):
     """Employee Check-In/Out tracking"""
@@ -264,6 +280,11 @@ class Message(Base):
     recipient = relationship("User", foreign_keys=[recipient_id], back_populates="received_messages")
     department = relationship("Department", back_populates="messages")
 
+    __table_args__ = (
+        Index('ix_message_recipient_live', 'recipient_id', postgresql_where=is_deleted_by_recipient == False),
+        Index('ix_message_sender_live', 'sender_id', postgresql_where=is_deleted_by_sender == False),
+    )
+
 
 class Notification(Base):
     """System notifications"""
@@ -281,6 +302,10 @@ class Notification(Base):
     # Relationships
     user = relationship("User", back_populates="notifications")
 
+    __table_args__ = (
+        Index('ix_notification_user_unread', 'user_id', postgresql_where=is_read == False),
+    )
+
 
 class Unavailability(Base):
     """Employee unavailability/constraints"""
@@ -309,7 +334,7 @@ class Shift(Base):
     priority = Column(Integer, default=50)
     min_emp = Column(Integer, default=1)  # Minimum employees required
     max_emp = Column(Integer, default=10)  # Maximum employees allowed
-    schedule_config = Column(JSON, default=dict)
+    schedule_config = Column(JSON, default=lambda: {day: {'enabled': True} for day in WEEKDAY_NAMES})  # Every day enabled unless configured
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -403,6 +428,10 @@ class CompOffRequest(Base):
     manager = relationship("Manager")
     schedule = relationship("Schedule")
 
+    __table_args__ = (
+        Index('ix_compoff_req_emp_date', 'employee_id', 'comp_off_date'),
+    )
+
 
 class CompOffTracking(Base):
     """Track comp-off balance per employee (earned and used) with monthly expiry"""
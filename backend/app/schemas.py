@@ -1,7 +1,8 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, field_validator
 from typing import Optional, List, Dict
 from datetime import date, datetime
 from app.models import UserType, LeaveStatus
+from app.holidays_jp import WEEKDAY_NAMES
 
 
 # Unavailability schemas
@@ -23,6 +24,26 @@ class UnavailabilityResponse(BaseModel):
 
 
 # Shift schemas (for shift type/shift timing configuration)
+def normalize_schedule_config(config) -> dict:
+    """
+    Return a shift schedule_config with an entry for every weekday.
+    
+    An empty or invalid config means the shift runs every day (shifts created
+    before per-day configuration existed); otherwise missing or malformed days
+    are disabled. Existing per-day settings (times, priority) are kept.
+    """
+    if not config or not isinstance(config, dict):
+        return {day: {'enabled': True} for day in WEEKDAY_NAMES}
+    normalized = dict(config)
+    for day in WEEKDAY_NAMES:
+        day_config = config.get(day)
+        if not isinstance(day_config, dict):
+            normalized[day] = {'enabled': False}
+        elif 'enabled' not in day_config:
+            normalized[day] = {**day_config, 'enabled': False}
+    return normalized
+
+
 class ShiftCreate(BaseModel):
     role_id: int
     name: str
@@ -31,7 +52,12 @@ class ShiftCreate(BaseModel):
     priority: int = 50
     min_emp: int = 1
     max_emp: int = 10
-    schedule_config: dict = {}
+    schedule_config: dict = Field(default={}, validate_default=True)
+
+    @field_validator('schedule_config')
+    @classmethod
+    def normalize_days(cls, v):
+        return normalize_schedule_config(v)
 
 
 class ShiftUpdate(BaseModel):
@@ -43,6 +69,11 @@ class ShiftUpdate(BaseModel):
     max_emp: Optional[int] = None
     schedule_config: Optional[dict] = None
 
+    @field_validator('schedule_config')
+    @classmethod
+    def normalize_days(cls, v):
+        return v if v is None else normalize_schedule_config(v)
+
 
 class ShiftResponse(BaseModel):
     id: int
@@ -320,6 +351,10 @@ class LeaveApproval(BaseModel):
     review_notes: Optional[str] = None
 
 
+class CompOffBulkApproval(LeaveApproval):
+    ids: List[int]
+
+
 # Message schemas
 class MessageBase(BaseModel):
     subject: Optional[str] = None